@@ -1,18 +1,51 @@
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
+import threading
+import hashlib
 import logging
 import os
 
+from Database_connection.db_pool import ConnectionPool
+
 # Database configuration
 DB_NAME = "mlops_image_db"
 DB_USER = "postgres"
 DB_PASSWORD = "admin"
 DB_PORT = "5432"
 DB_HOST = "postgres"
+BLOB_TABLE = "image_blobs"
+COUNTER_TABLE = "retrain_counter"
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name=DB_NAME):
+    """Returns the shared connection pool for ``db_name``, creating it on first use."""
+    with _pools_lock:
+        if db_name not in _pools:
+            _pools[db_name] = ConnectionPool(
+                database=db_name,
+                user=DB_USER,
+                password=DB_PASSWORD,
+                host=DB_HOST,
+                port=DB_PORT
+            )
+            logging.info(f"[DB] Connection pool created for '{db_name}'.")
+        return _pools[db_name]
+
+
+def close_pools():
+    """Closes every pooled connection; call on shutdown."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
 
 def create_database(db_name=DB_NAME):
     """Creates the PostgreSQL database if it does not exist."""
@@ -39,77 +72,139 @@ def create_database(db_name=DB_NAME):
         raise e
 
 
+def image_digest(binary_data):
+    """Returns the hex SHA-256 used as the content address of an image."""
+    return hashlib.sha256(binary_data).hexdigest()
+
+
 def create_table(db_name, table_name):
-    """Creates the required table with image and label columns."""
+    """Creates a record table holding a blob reference, label and timestamp.
+
+    Image bytes live once in the content-addressed ``image_blobs`` table,
+    keyed by SHA-256. Tables created by older versions with an inline
+    ``image`` BYTEA column are migrated in place.
+    """
+    def _create(conn):
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {} (
+                    sha256 TEXT PRIMARY KEY,
+                    image BYTEA NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """).format(sql.Identifier(BLOB_TABLE)))
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id SERIAL PRIMARY KEY,
+                    image_hash TEXT NOT NULL REFERENCES {blobs} (sha256),
+                    label TEXT NOT NULL,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """).format(table=sql.Identifier(table_name), blobs=sql.Identifier(BLOB_TABLE)))
+            _migrate_inline_images(cur, table_name)
+
     try:
-        conn = psycopg2.connect(
-            database=db_name,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        cur = conn.cursor()
-        cur.execute(sql.SQL(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                id SERIAL PRIMARY KEY,
-                image BYTEA NOT NULL,
-                label TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """))
-        conn.commit()
+        get_pool(db_name).run(_create)
         logging.info(f"[DB] Table '{table_name}' created or already exists.")
-        cur.close()
-        conn.close()
     except Exception as e:
         logging.error(f"[DB ERROR] Table '{table_name}' creation failed: {e}")
         raise e
 
 
+def _migrate_inline_images(cur, table_name):
+    """Moves inline ``image`` BYTEA values of a legacy table into ``image_blobs``."""
+    cur.execute(
+        "SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = 'image';",
+        (table_name,)
+    )
+    if not cur.fetchone():
+        return
+
+    params = {"table": sql.Identifier(table_name), "blobs": sql.Identifier(BLOB_TABLE)}
+    cur.execute(sql.SQL("ALTER TABLE {table} ADD COLUMN IF NOT EXISTS image_hash TEXT REFERENCES {blobs} (sha256);").format(**params))
+    cur.execute(sql.SQL("""
+        INSERT INTO {blobs} (sha256, image)
+        SELECT encode(sha256(image), 'hex'), image FROM {table} WHERE image IS NOT NULL
+        ON CONFLICT (sha256) DO NOTHING;
+    """).format(**params))
+    cur.execute(sql.SQL("UPDATE {table} SET image_hash = encode(sha256(image), 'hex') WHERE image_hash IS NULL;").format(**params))
+    cur.execute(sql.SQL("ALTER TABLE {table} ALTER COLUMN image_hash SET NOT NULL, DROP COLUMN image;").format(**params))
+    logging.info(f"[DB] Migrated inline images of '{table_name}' to '{BLOB_TABLE}'.")
+
+
 def insert_image_record(db_name, table_name, image_path, label):
-    """Inserts image bytes and label into the specified table."""
-    try:
-        with open(image_path, 'rb') as f:
-            binary_data = f.read()
+    """Inserts image bytes read from ``image_path`` and label into the specified table."""
+    with open(image_path, 'rb') as f:
+        binary_data = f.read()
+    insert_image_bytes(db_name, table_name, binary_data, label)
 
-        conn = psycopg2.connect(
-            database=db_name,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        cur = conn.cursor()
-        cur.execute(
-            sql.SQL("INSERT INTO {} (image, label) VALUES (%s, %s)").format(sql.Identifier(table_name)),
-            (binary_data, label)
-        )
-        conn.commit()
-        logging.info(f"[DB] Image record inserted into '{table_name}'.")
-        cur.close()
-        conn.close()
+
+def insert_image_bytes(db_name, table_name, binary_data, label):
+    """Inserts already-loaded image bytes and label into the specified table."""
+    insert_image_records(db_name, [table_name], [(binary_data, label)])
+
+
+def insert_image_records(db_name, table_names, records):
+    """Bulk-inserts ``(image_bytes, label)`` records into every table in ``table_names`` in one transaction.
+
+    Each distinct image is stored once in ``image_blobs``; the record
+    tables only receive its hash, so duplicate uploads cost one row each.
+    An integrity error is retried once: the extraction task's blob sweep
+    can delete an existing blob between our insert and the foreign key
+    check, and the retry stores it again.
+    """
+    if not records:
+        return
+
+    blobs = {}
+    rows = []
+    for binary_data, label in records:
+        digest = image_digest(binary_data)
+        blobs.setdefault(digest, binary_data)
+        rows.append((digest, label))
+
+    def _insert(conn):
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                sql.SQL("INSERT INTO {} (sha256, image) VALUES %s ON CONFLICT (sha256) DO NOTHING").format(
+                    sql.Identifier(BLOB_TABLE)).as_string(cur),
+                [(digest, psycopg2.Binary(data)) for digest, data in blobs.items()],
+                page_size=len(blobs)
+            )
+            for table_name in table_names:
+                execute_values(
+                    cur,
+                    sql.SQL("INSERT INTO {} (image_hash, label) VALUES %s").format(sql.Identifier(table_name)).as_string(cur),
+                    rows,
+                    page_size=len(rows)
+                )
+
+    try:
+        try:
+            get_pool(db_name).run(_insert)
+        except psycopg2.IntegrityError as e:
+            logging.warning(f"[DB] Retrying insert into {', '.join(table_names)} after an integrity error: {e}")
+            get_pool(db_name).run(_insert)
+        logging.info(f"[DB] {len(rows)} image records ({len(blobs)} distinct images) inserted into {', '.join(table_names)}.")
     except Exception as e:
-        logging.error(f"[DB ERROR] Failed to insert image into '{table_name}': {e}")
+        logging.error(f"[DB ERROR] Bulk insert into {', '.join(table_names)} failed: {e}")
         raise e
 
 
 def fetch_last_image_record(db_name, table_name):
     """Fetches the last inserted image record from the specified table."""
+    def _fetch(conn):
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("""
+                SELECT t.id, b.image, t.label, t.timestamp
+                FROM {table} t JOIN {blobs} b ON b.sha256 = t.image_hash
+                ORDER BY t.id DESC LIMIT 1;
+            """).format(table=sql.Identifier(table_name), blobs=sql.Identifier(BLOB_TABLE)))
+            return cur.fetchone()
+
     try:
-        conn = psycopg2.connect(
-            database=db_name,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        cur = conn.cursor()
-        cur.execute(sql.SQL("SELECT * FROM {} ORDER BY id DESC LIMIT 1;").format(sql.Identifier(table_name)))
-        record = cur.fetchone()
-        cur.close()
-        conn.close()
-        return record
+        return get_pool(db_name).run(_fetch)
     except Exception as e:
         logging.error(f"[DB ERROR] Fetching last record from '{table_name}' failed: {e}")
         return None
@@ -117,23 +212,60 @@ def fetch_last_image_record(db_name, table_name):
 
 def clear_temp_table(db_name, temp_table="temp_image_data"):
     """Truncates the temporary table after processing."""
+    def _truncate(conn):
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("TRUNCATE TABLE {};").format(sql.Identifier(temp_table)))
+
     try:
-        conn = psycopg2.connect(
-            database=db_name,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        cur = conn.cursor()
-        cur.execute(sql.SQL("TRUNCATE TABLE {};").format(sql.Identifier(temp_table)))
-        conn.commit()
+        get_pool(db_name).run(_truncate)
         logging.info(f"[DB] Temporary table '{temp_table}' cleared.")
-        cur.close()
-        conn.close()
     except Exception as e:
         logging.error(f"[DB ERROR] Failed to clear table '{temp_table}': {e}")
         raise e
 
 
+def create_counter_table(db_name):
+    """Creates the single-row retraining counter table."""
+    def _create(conn):
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {} (
+                    id INTEGER PRIMARY KEY,
+                    count BIGINT NOT NULL DEFAULT 0
+                );
+            """).format(sql.Identifier(COUNTER_TABLE)))
+            cur.execute(sql.SQL("INSERT INTO {} (id, count) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;").format(
+                sql.Identifier(COUNTER_TABLE)))
+
+    try:
+        get_pool(db_name).run(_create)
+        logging.info(f"[DB] Table '{COUNTER_TABLE}' created or already exists.")
+    except Exception as e:
+        logging.error(f"[DB ERROR] Table '{COUNTER_TABLE}' creation failed: {e}")
+        raise e
+
+
+def increment_counter(db_name, amount, threshold):
+    """Atomically adds ``amount`` to the retraining counter.
+
+    The row lock taken by the UPDATE serializes concurrent callers across
+    processes and containers. When the counter reaches ``threshold`` it
+    keeps only the overshoot (``(count + amount) % threshold``) in the same
+    statement and ``True`` is returned, so exactly one caller sees each
+    crossing and a large flush loses no counts.
+    """
+    def _increment(conn):
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("""
+                WITH previous AS (SELECT count FROM {table} WHERE id = 1 FOR UPDATE)
+                UPDATE {table} SET count = (previous.count + %(amount)s) %% %(threshold)s
+                FROM previous
+                WHERE {table}.id = 1
+                RETURNING previous.count + %(amount)s >= %(threshold)s;
+            """).format(table=sql.Identifier(COUNTER_TABLE)), {"amount": amount, "threshold": threshold})
+            return cur.fetchone()
 
+    row = get_pool(db_name).run(_increment)
+    if row is None:
+        raise RuntimeError(f"Counter table '{COUNTER_TABLE}' is not initialized")
+    return row[0]
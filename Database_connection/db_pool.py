@@ -0,0 +1,98 @@
+import psycopg2
+from psycopg2 import pool as pg_pool
+from contextlib import contextmanager
+import threading
+import logging
+import time
+import os
+
+# Pool configuration
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30"))
+
+RECONNECT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool with health checks and reconnect on failure.
+
+    Checkouts block for up to ``timeout`` seconds when all ``maxconn``
+    connections are in use. A connection that sat idle for longer than
+    ``healthcheck_interval`` seconds is pinged before it is handed out, and
+    connections that fail with a connection-level error are discarded so the
+    next checkout opens a fresh one.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 healthcheck_interval=DB_POOL_HEALTHCHECK_INTERVAL, **conn_kwargs):
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **conn_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._timeout = timeout
+        self._healthcheck_interval = healthcheck_interval
+        self._last_used = {}
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0.0) < self._healthcheck_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except RECONNECT_ERRORS:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def _checkout(self):
+        conn = self._pool.getconn()
+        if not self._is_healthy(conn):
+            logging.warning("[DB POOL] Dropping dead connection and reconnecting.")
+            self._discard(conn)
+            conn = self._pool.getconn()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Yields a pooled connection; commits on success and rolls back on error."""
+        if not self._slots.acquire(timeout=self._timeout):
+            raise pg_pool.PoolError(f"No database connection available within {self._timeout}s")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+            conn.commit()
+        except RECONNECT_ERRORS:
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        except Exception:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+            self._slots.release()
+
+    def run(self, fn, retries=1):
+        """Calls ``fn(conn)`` in a transaction, retrying on a fresh connection if the old one died."""
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    return fn(conn)
+            except RECONNECT_ERRORS as e:
+                if attempt == retries:
+                    raise
+                logging.warning(f"[DB POOL] Connection failed ({e}); retrying on a new connection.")
+
+    def close(self):
+        self._pool.closeall()
@@ -2,7 +2,7 @@ import time
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from Database_connection.db_init import create_database, create_table
+from Database_connection.db_init import create_database, create_table, create_counter_table
 
 DB_NAME = "mlops_image_db"
 TABLE1 = "temp_image_data"
@@ -15,6 +15,7 @@ for attempt in range(MAX_RETRIES):
         create_database(DB_NAME)
         create_table(DB_NAME, TABLE1)
         create_table(DB_NAME, TABLE2)
+        create_counter_table(DB_NAME)
         print("Database and tables created successfully.")
         break
     except Exception as e:
@@ -0,0 +1,123 @@
+import threading
+import logging
+import queue
+import time
+import os
+
+from prometheus_client import Counter, Gauge
+
+from Database_connection.db_init import insert_image_records
+from utils.executors import QueueFullError
+
+# Write-behind configuration
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "64"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "1.0"))
+WRITE_MAX_QUEUE = int(os.getenv("WRITE_MAX_QUEUE", "1024"))
+WRITE_RETRIES = int(os.getenv("WRITE_RETRIES", "3"))
+
+ROWS_INSERTED = Counter("rps_db_rows_inserted_total", "Prediction records written to the database.", ["table"])
+ROWS_DROPPED = Counter("rps_db_rows_dropped_total", "Prediction records never written to the database.", ["reason"])
+QUEUE_DEPTH = Gauge("rps_db_write_queue_depth", "Prediction records waiting to be written.")
+
+_STOP = object()
+
+
+class RecordWriter:
+    """Buffers prediction records and writes them to the database in the background.
+
+    Records are flushed with one bulk insert per table, all tables in a
+    single transaction, whenever ``batch_size`` records are buffered or
+    ``flush_interval`` seconds have passed since the first buffered record.
+    After a successful flush ``on_flush`` is called with the number of
+    records written, on the writer thread. ``stop`` drains whatever is
+    still queued.
+    """
+
+    def __init__(self, db_name, table_names, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval=WRITE_FLUSH_INTERVAL, max_queue=WRITE_MAX_QUEUE, on_flush=None):
+        self.db_name = db_name
+        self.table_names = list(table_names)
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="rps-record-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logging.info(f"[DB] Write-behind writer started for {', '.join(self.table_names)}.")
+        return self
+
+    def stop(self, timeout=30.0):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        logging.info("[DB] Write-behind writer drained and stopped.")
+
+    def submit(self, image_bytes, label):
+        try:
+            self._queue.put_nowait((image_bytes, label))
+        except queue.Full:
+            ROWS_DROPPED.labels(reason="queue_full").inc()
+            raise QueueFullError("database write queue is full")
+        QUEUE_DEPTH.inc()
+
+    def _collect(self):
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        records = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(records) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return records, True
+            records.append(item)
+        return records, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            records, stopping = self._collect()
+            if records:
+                self._flush(records)
+
+        # Anything submitted after stop() was requested still gets written.
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.batch_size):
+            self._flush(leftover[start:start + self.batch_size])
+
+    def _flush(self, records):
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                insert_image_records(self.db_name, self.table_names, records)
+                break
+            except Exception as e:
+                if attempt == WRITE_RETRIES:
+                    logging.error(f"[DB ERROR] Dropping {len(records)} records after {attempt} failed writes: {e}")
+                    ROWS_DROPPED.labels(reason="write_failed").inc(len(records))
+                    QUEUE_DEPTH.dec(len(records))
+                    return
+                time.sleep(min(2 ** attempt, 10))
+
+        for table_name in self.table_names:
+            ROWS_INSERTED.labels(table=table_name).inc(len(records))
+        QUEUE_DEPTH.dec(len(records))
+        if self.on_flush is not None:
+            try:
+                self.on_flush(len(records))
+            except Exception as e:
+                logging.error(f"[DB ERROR] Post-flush hook failed for {len(records)} records: {e}")
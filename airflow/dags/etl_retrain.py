@@ -30,20 +30,22 @@ with DAG(
     extract = extraction_image.override(task_id="extract_images_from_postgres")(
         db_name="mlops_image_db",
         table_name="temp_image_data",
-        folder_extracted="Data/raw_data"
+        folder_extracted="Data/raw_data",
+        export_mode="raw"
     )
 
     preprocess = preprocess_and_save_images.override(task_id="preprocess_images")(
         input_dir="Data/raw_data",
         output_dir="Data/for_retraining_prep",
         target_size=(224, 224),
-        blur_threshold=50.0
+        blur_threshold=50.0,
+        packed_dir="Data/for_retraining_packed"
     )
 
     retrain = PythonOperator(
         task_id="retrain_rps_model",
         python_callable=train_and_log_task,
-        op_kwargs={"preprocessed_path": "Data/for_retraining_prep"},
+        op_kwargs={"preprocessed_path": "Data/for_retraining_packed"},
         execution_timeout=timedelta(hours=2)
     )
 
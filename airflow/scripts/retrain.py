@@ -1,25 +1,84 @@
+def exported_hash_prefixes(directory: str) -> list:
+    """Returns the ``hash[:16]`` carried by every ``<label>_<hash16>`` image name in a training set.
+
+    ``directory`` is either an image tree or a packed directory, whose
+    ``index.json`` keeps the original file names.
+    """
+    import json
+    import os
+    import re
+
+    pattern = re.compile(r"^[a-z]+_([0-9a-f]{16})\.[a-z]+$")
+    index_path = os.path.join(directory, "index.json")
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            names = [name for shard in json.load(f)["shards"] for name in shard["names"]]
+    else:
+        names = [name for _, _, files in os.walk(directory) for name in files]
+    return sorted({match.group(1) for match in map(pattern.match, names) if match})
+
+
+def replay_sampler(db_name: str, table_name: str = "image_data", blob_table: str = "image_blobs", size: int = 500,
+                   exclude_prefixes=()):
+    """Samples ``size`` labelled images already in ``table_name`` for replay during a warm-start retrain.
+
+    Rows whose ``image_hash[:16]`` is in ``exclude_prefixes`` are skipped:
+    the images being retrained on are in ``table_name`` too, and replaying
+    them would leak validation images into training. Returns ``(rows,
+    fetch_blobs)``: ``rows`` are ``(label, image_hash)`` and
+    ``fetch_blobs(hashes)`` loads image bytes for the hashes whose features
+    are not cached yet.
+    """
+    import psycopg2
+    from psycopg2 import sql
+
+    def connect():
+        return psycopg2.connect(database=db_name, user="postgres", password="admin", host="postgres", port="5432")
+
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                sql.SQL("SELECT label, image_hash FROM {} WHERE NOT left(image_hash, 16) = ANY(%s) "
+                        "ORDER BY random() LIMIT %s;").format(sql.Identifier(table_name)),
+                (list(exclude_prefixes), size)
+            )
+            rows = [(label.lower().strip(), image_hash) for label, image_hash in cur.fetchall()]
+    finally:
+        conn.close()
+
+    def fetch_blobs(hashes):
+        conn = connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    sql.SQL("SELECT sha256, image FROM {} WHERE sha256 = ANY(%s);").format(sql.Identifier(blob_table)),
+                    (list(hashes),)
+                )
+                return {image_hash: bytes(image) for image_hash, image in cur.fetchall()}
+        finally:
+            conn.close()
+
+    return rows, fetch_blobs
+
+
 # from airflow.decorators import task
 # @task
-def train_and_log_task(preprocessed_path: str):
+def train_and_log_task(preprocessed_path: str, warm_start: bool = True, replay_size: int = 500,
+                       db_name: str = "mlops_image_db"):
     import os
     import sys
+    import time
     import mlflow
-    import mlflow.keras
-    import numpy as np
     import logging
     import warnings as w
-    from PIL import Image
-
-    from keras.preprocessing.image import ImageDataGenerator
-    from keras.applications import MobileNetV2
-    from keras.models import Model
-    from keras.layers import Dense, GlobalAveragePooling2D
-    from keras.optimizers import Adam
-    from mlflow.models.signature import infer_signature
 
     w.filterwarnings('ignore')
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
     from src.model_making.model_resiter import register_model
+    from src.model_making.convert_model import convert_to_tflite
+    from src.model_making.head_training import load_warm_start_model, train_head_on_directory
+    from src.model_making.mlflow_logging import save_and_log_model
 
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -34,90 +93,52 @@ def train_and_log_task(preprocessed_path: str):
         mlflow.set_tracking_uri("http://mlflow:5000")
         mlflow.set_experiment("play-rock-paper-scissors-exp")
 
-        datagen = ImageDataGenerator(validation_split=0.2, rescale=1. / 255)
-
-        train_generator = datagen.flow_from_directory(
-            preprocessed_path,
-            target_size=(224, 224),
-            batch_size=16,
-            subset="training",
-            class_mode="categorical"
-        )
-
-        val_generator = datagen.flow_from_directory(
-            preprocessed_path,
-            target_size=(224, 224),
-            batch_size=16,
-            subset="validation",
-            class_mode="categorical"
-        )
-
-        base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
-        x = base_model.output
-        x = GlobalAveragePooling2D()(x)
-        x = Dense(128, activation="relu")(x)
-        predictions = Dense(3, activation="softmax")(x)
-        model = Model(inputs=base_model.input, outputs=predictions)
-
-        for layer in base_model.layers:
-            layer.trainable = False
-
-        model.compile(optimizer=Adam(), loss="categorical_crossentropy", metrics=["accuracy"])
+        # Warm start: fine-tune the deployed head on the new images plus a replay sample
+        # of older ones, so a handful of new images cannot make the model forget the rest.
+        base_model = load_warm_start_model() if warm_start else None
+        replay, fetch_replay_blobs = [], None
+        if base_model is not None and replay_size > 0:
+            try:
+                replay, fetch_replay_blobs = replay_sampler(
+                    db_name, size=replay_size, exclude_prefixes=exported_hash_prefixes(preprocessed_path)
+                )
+            except Exception as e:
+                logging.warning(f"Replay sample unavailable, fine-tuning on new data only: {e}")
 
         with mlflow.start_run():
-            history = model.fit(train_generator, epochs=5, validation_data=val_generator)
+            started = time.perf_counter()
+            # Only images not seen by an earlier run go through the frozen backbone.
+            model, history = train_head_on_directory(
+                preprocessed_path,
+                epochs=5,
+                warm_start=base_model,
+                replay=replay,
+                fetch_replay_blobs=fetch_replay_blobs,
+                patience=2
+            )
+            mlflow.log_metric("train_seconds", time.perf_counter() - started)
 
             mlflow.log_param("base_model", "MobileNetV2")
             mlflow.log_param("epochs", 5)
+            mlflow.log_param("epochs_run", len(history.history["loss"]))
+            mlflow.log_param("warm_start", base_model is not None)
+            mlflow.log_param("replay_samples", len(replay))
             mlflow.log_param("image_size", "224x224")
             mlflow.log_metric("train_accuracy", history.history["accuracy"][-1])
-            mlflow.log_metric("val_accuracy", history.history["val_accuracy"][-1])
+            if "val_accuracy" in history.history:
+                mlflow.log_metric("val_accuracy", history.history["val_accuracy"][-1])
             artifact_dir = os.path.join(os.getcwd(), "artifacts")
             os.makedirs(artifact_dir, exist_ok=True)
             model_path = os.path.join(artifact_dir, "rps_model_mobilenet.h5")
-            model.save(model_path)
-            logging.info(f"Model saved at: {model_path}")
-            sample_images = []
-            for label in os.listdir(preprocessed_path):
-                label_path = os.path.join(preprocessed_path, label)
-                if not os.path.isdir(label_path):
-                    continue
-                for file in os.listdir(label_path):
-                    if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                        try:
-                            img_path = os.path.join(label_path, file)
-                            img = Image.open(img_path).convert("RGB").resize((224, 224))
-                            sample_images.append(np.array(img) / 255.0)
-                            if len(sample_images) == 5:
-                                break
-                        except Exception as img_err:
-                            logging.warning(f"Skipping image due to error: {img_err}")
-                if len(sample_images) == 5:
-                    break
-
-            if len(sample_images) == 0:
-                raise ValueError("No valid sample images found.")
-
-            x_sample = np.array(sample_images)
-            if x_sample.ndim == 3:
-                x_sample = np.expand_dims(x_sample, axis=0)
-
-            
-            preds_sample = model.predict(x_sample)
-            signature = infer_signature(x_sample, preds_sample)
-
-            mlflow.keras.log_model(
-                model,
-                artifact_path="rps_cnn_model",
-                signature=signature,
-                pip_requirements=[
-                "tensorflow-cpu==2.13.0",
-                "keras==2.13.1",
-                "mlflow==2.4.1",
-                "pandas",
-                "pillow==10.0.0"
-            ]
-            )
+            mlflow.log_metric("log_model_seconds", save_and_log_model(model, model_path))
+
+            try:
+                started = time.perf_counter()
+                tflite_path = convert_to_tflite(model, os.path.splitext(model_path)[0] + ".tflite")
+                mlflow.log_artifact(tflite_path, artifact_path="rps_tflite_model")
+                mlflow.log_metric("tflite_seconds", time.perf_counter() - started)
+            except Exception as e:
+                logging.warning(f"TFLite conversion failed, serving stays on the Keras model: {e}")
 
             logging.info("Model logged to MLflow successfully.")
 
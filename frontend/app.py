@@ -5,6 +5,7 @@ st.set_page_config(page_title="✊ RPS Predictor", layout="centered")
 st.title("🖼️ Rock Paper Scissors Predictor (Upload Only)")
 
 FRAME_CAPTURE_URL = "http://backend:8000/predict/"
+BATCH_PREDICT_URL = "http://backend:8000/predict/batch"
 FINISH_URL = "http://backend:8000/finish/"
 
 # Session state
@@ -14,19 +15,34 @@ if 'dag_triggered' not in st.session_state:
     st.session_state.dag_triggered = False
 
 # Upload section
-uploaded_file = st.file_uploader("📤 Upload an image (jpg, jpeg, png)", type=["jpg", "jpeg", "png"])
+uploaded_files = st.file_uploader("📤 Upload one or more images (jpg, jpeg, png)", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
 predict_btn = st.button("🔍 Predict")
 
-if uploaded_file and predict_btn:
-    files = {'image': (uploaded_file.name, uploaded_file.read(), 'image/jpeg')}
+if uploaded_files and predict_btn:
     try:
-        res = requests.post(FRAME_CAPTURE_URL, files=files)
-        if res.status_code == 200:
-            prediction = res.json().get("prediction", "Unknown")
-            st.success(f"🎯 Prediction: **{prediction}**")
-            st.session_state.prediction_count += 1
+        if len(uploaded_files) == 1:
+            uploaded_file = uploaded_files[0]
+            files = {'image': (uploaded_file.name, uploaded_file.read(), 'image/jpeg')}
+            res = requests.post(FRAME_CAPTURE_URL, files=files)
+            if res.status_code == 200:
+                prediction = res.json().get("prediction", "Unknown")
+                st.success(f"🎯 Prediction: **{prediction}**")
+                st.session_state.prediction_count += 1
+            else:
+                st.error("⚠️ Backend returned an error.")
         else:
-            st.error("⚠️ Backend returned an error.")
+            # One round trip for the whole selection instead of one per image.
+            files = [('images', (f.name, f.read(), 'image/jpeg')) for f in uploaded_files]
+            res = requests.post(BATCH_PREDICT_URL, files=files)
+            if res.status_code == 200:
+                for result in res.json().get("results", []):
+                    if "prediction" in result:
+                        st.success(f"🎯 {result['filename']}: **{result['prediction']}**")
+                        st.session_state.prediction_count += 1
+                    else:
+                        st.warning(f"⚠️ {result['filename']}: {result.get('error', 'Unknown error')}")
+            else:
+                st.error("⚠️ Backend returned an error.")
     except Exception as e:
         st.error(f"❌ API Error: `{e}`")
 
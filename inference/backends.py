@@ -0,0 +1,154 @@
+import functools
+import logging
+import os
+
+import numpy as np
+
+# keras | tflite | onnx | auto (pick by file extension)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras")
+INFERENCE_NUM_THREADS = int(os.getenv("INFERENCE_NUM_THREADS", "0")) or None
+# Fixed TFLite input batch sizes; a batch is padded up to the next one. Keep the largest
+# equal to BATCH_MAX_SIZE so a full micro-batch runs in a single invoke.
+TFLITE_BATCH_BUCKETS = sorted({int(n) for n in os.getenv("TFLITE_BATCH_BUCKETS", "1,2,4,8,16").split(",") if n})
+
+BACKEND_EXTENSIONS = {
+    "keras": ".h5",
+    "tflite": ".tflite",
+    "onnx": ".onnx"
+}
+
+
+class KerasBackend:
+    """Runs the full Keras model with TensorFlow."""
+
+    name = "keras"
+
+    def __init__(self, path, num_threads=INFERENCE_NUM_THREADS):
+        import tensorflow as tf
+        from keras.models import load_model as keras_load
+
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            except RuntimeError:
+                # Threading can only be configured before TensorFlow initialises.
+                pass
+        self.model = keras_load(path)
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend:
+    """Runs a converted (optionally INT8-quantized) TFLite flatbuffer.
+
+    Resizing an interpreter's input re-plans its tensors, so instead of
+    resizing per batch there is one interpreter per size in ``buckets``;
+    each batch is zero-padded to the smallest bucket that holds it and the
+    padding rows are sliced off the output. Each interpreter has its own
+    tensor arena, so one is only created once a batch first needs that
+    bucket (the smallest one at load, to validate the file).
+    """
+
+    name = "tflite"
+
+    def __init__(self, path, num_threads=INFERENCE_NUM_THREADS, shared_weights=False, buckets=TFLITE_BATCH_BUCKETS):
+        try:
+            from tflite_runtime.interpreter import Interpreter, OpResolverType
+        except ImportError:
+            from tensorflow.lite import Interpreter
+            from tensorflow.lite.experimental import OpResolverType
+
+        # The flatbuffer is memory-mapped from model_path. With shared_weights the
+        # default (XNNPACK) delegate is skipped so kernels read weights from that
+        # mapping rather than repacking them into private memory.
+        resolver = OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES if shared_weights else OpResolverType.AUTO
+        self._new_interpreter = functools.partial(Interpreter, model_path=path, num_threads=num_threads,
+                                                  experimental_op_resolver_type=resolver)
+        self.buckets = list(buckets)
+        self._interpreters = {}
+        self._interpreter(self.buckets[0])
+
+    def _interpreter(self, bucket):
+        if bucket not in self._interpreters:
+            interpreter = self._new_interpreter()
+            input_details = interpreter.get_input_details()[0]
+            interpreter.resize_tensor_input(input_details["index"], [bucket, *input_details["shape"][1:]])
+            interpreter.allocate_tensors()
+            self._interpreters[bucket] = (
+                interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0]
+            )
+        return self._interpreters[bucket]
+
+    def _bucket(self, batch_size):
+        return next((bucket for bucket in self.buckets if bucket >= batch_size), self.buckets[-1])
+
+    def predict(self, batch):
+        largest = self.buckets[-1]
+        if len(batch) > largest:
+            return np.concatenate([self.predict(batch[start:start + largest]) for start in range(0, len(batch), largest)])
+
+        interpreter, input_details, output_details = self._interpreter(self._bucket(len(batch)))
+        dtype = input_details["dtype"]
+        if dtype != np.float32:
+            scale, zero_point = input_details["quantization"]
+            batch = np.clip(np.round(batch / scale + zero_point), np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+        padded = np.zeros(input_details["shape"], dtype=dtype)
+        padded[:len(batch)] = batch
+        interpreter.set_tensor(input_details["index"], padded)
+        interpreter.invoke()
+        out = interpreter.get_tensor(output_details["index"])[:len(batch)]
+        if output_details["dtype"] != np.float32:
+            scale, zero_point = output_details["quantization"]
+            out = (out.astype(np.float32) - zero_point) * scale
+        return np.array(out)
+
+
+class OnnxBackend:
+    """Runs an ONNX export of the model with ONNX Runtime."""
+
+    name = "onnx"
+
+    def __init__(self, path, num_threads=INFERENCE_NUM_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend
+}
+
+
+def resolve_backend(path, backend=None):
+    """Returns ``(backend_name, artifact_path)`` for ``path``.
+
+    Converted artifacts sit next to the Keras ``.h5`` with a different
+    extension, so an explicit backend swaps the extension of ``path``.
+    """
+    backend = backend or INFERENCE_BACKEND
+    root, ext = os.path.splitext(path)
+    if backend == "auto":
+        for name, backend_ext in BACKEND_EXTENSIONS.items():
+            if ext == backend_ext:
+                return name, path
+        raise ValueError(f"Cannot infer inference backend from '{path}'")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {sorted(BACKENDS)}")
+    return backend, root + BACKEND_EXTENSIONS[backend]
+
+
+def load_backend(path, backend=None):
+    name, artifact_path = resolve_backend(path, backend)
+    model = BACKENDS[name](artifact_path)
+    logging.info(f"[MODEL] Loaded '{artifact_path}' with the {name} backend.")
+    return model
@@ -0,0 +1,55 @@
+import io
+import os
+import tarfile
+import zipfile
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "256"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def _from_zip(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield info.filename, info.file_size, lambda info=info: archive.read(info)
+
+
+def _from_tar(data):
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as archive:
+        for member in archive.getmembers():
+            if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield member.name, member.size, lambda member=member: archive.extractfile(member).read()
+
+
+def unpack_uploads(uploads):
+    """Expands ``(filename, bytes)`` uploads into a flat list of ``(filename, image_bytes)``.
+
+    Plain images pass through; ``.zip`` and ``.tar``/``.tar.gz``/``.tgz``
+    uploads are unpacked in memory, keeping only image members. Raises
+    ``ValueError`` when the batch exceeds ``BATCH_MAX_IMAGES`` images or
+    ``BATCH_MAX_BYTES`` uncompressed bytes.
+    """
+    images = []
+    total_bytes = 0
+
+    def add(name, size, read):
+        nonlocal total_bytes
+        total_bytes += size
+        if len(images) >= BATCH_MAX_IMAGES:
+            raise ValueError(f"Batch exceeds the limit of {BATCH_MAX_IMAGES} images")
+        if total_bytes > BATCH_MAX_BYTES:
+            raise ValueError(f"Batch exceeds the limit of {BATCH_MAX_BYTES} bytes")
+        images.append((name, read()))
+
+    for filename, data in uploads:
+        name = (filename or "").lower()
+        if name.endswith(".zip"):
+            members = _from_zip(data)
+        elif name.endswith((".tar", ".tar.gz", ".tgz")):
+            members = _from_tar(data)
+        else:
+            members = [(filename, len(data), lambda data=data: data)]
+        for member_name, size, read in members:
+            add(member_name, size, read)
+    return images
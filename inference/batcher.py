@@ -0,0 +1,136 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from prometheus_client import Histogram
+
+from inference.predictor import IMAGE_SIZE, normalize_batch, predict_batch, to_predictions
+from utils.executors import QueueFullError
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "256"))
+
+BATCH_SIZE = Histogram(
+    "rps_inference_batch_size",
+    "Number of images run through a single forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+QUEUE_WAIT = Histogram(
+    "rps_inference_queue_wait_seconds",
+    "Time an image waits in the batching queue before its forward pass.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Collects single images into batches and runs one forward pass per batch.
+
+    A batch is flushed as soon as it holds ``max_batch_size`` images or the
+    oldest queued image has waited ``max_wait_ms`` milliseconds. At most
+    ``max_queue`` images may wait at once; beyond that ``submit`` raises
+    ``QueueFullError``. ``get_model`` is called once per batch, so a model
+    swapped in mid-flight only affects later batches.
+    """
+
+    def __init__(self, get_model, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, max_queue=BATCH_MAX_QUEUE):
+        self.get_model = get_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._buffer = np.empty((max_batch_size, *IMAGE_SIZE, 3), dtype=np.float32)
+        self._thread = threading.Thread(target=self._run, name="rps-micro-batcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logging.info(f"[BATCH] Batcher started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:.1f}).")
+        return self
+
+    def stop(self, timeout=10.0):
+        """Flushes everything already queued, then stops the worker thread."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def submit(self, x) -> Future:
+        """Queues one decoded (224, 224, 3) uint8 image; the future resolves to its ``Prediction``."""
+        future = Future()
+        try:
+            self._queue.put_nowait((x, time.perf_counter(), future))
+        except queue.Full:
+            raise QueueFullError("inference batch queue is full")
+        return future
+
+    def _collect(self):
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        items = [item]
+        deadline = item[1] + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            items, stopping = self._collect()
+            if items:
+                self._process(items)
+        logging.info("[BATCH] Batcher stopped.")
+
+    def _process(self, items):
+        started = time.perf_counter()
+        for _, enqueued_at, _ in items:
+            QUEUE_WAIT.observe(started - enqueued_at)
+        BATCH_SIZE.observe(len(items))
+
+        model = self.get_model()
+        if hasattr(model, "submit"):
+            # Worker pool: normalization and the forward pass run in another
+            # process, so hand off the uint8 images and move on to the next batch.
+            try:
+                pending = model.submit(np.stack([x for x, _, _ in items]))
+            except Exception as e:
+                self._fail(items, e)
+                return
+            pending.add_done_callback(lambda done: self._resolve(items, done))
+            return
+
+        try:
+            batch = normalize_batch([x for x, _, _ in items], out=self._buffer)
+            predictions = predict_batch(batch, model)
+        except Exception as e:
+            self._fail(items, e)
+            return
+        self._deliver(items, predictions)
+
+    def _resolve(self, items, done):
+        try:
+            predictions = to_predictions(done.result())
+        except Exception as e:
+            self._fail(items, e)
+            return
+        self._deliver(items, predictions)
+
+    def _fail(self, items, error):
+        logging.error(f"[BATCH ERROR] Forward pass failed for batch of {len(items)}: {error}")
+        for _, _, future in items:
+            future.set_exception(error)
+
+    def _deliver(self, items, predictions):
+        for (_, _, future), prediction in zip(items, predictions):
+            future.set_result(prediction)
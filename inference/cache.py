@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge
+
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "10000"))
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+MODEL_VERSION_CHECK_INTERVAL = float(os.getenv("MODEL_VERSION_CHECK_INTERVAL", "1.0"))
+
+CACHE_HITS = Counter("rps_prediction_cache_hits_total", "Predictions served from the cache.")
+CACHE_MISSES = Counter("rps_prediction_cache_misses_total", "Predictions that had to run the model.")
+CACHE_EVICTIONS = Counter("rps_prediction_cache_evictions_total", "Cache entries evicted.", ["reason"])
+CACHE_BYTES = Gauge("rps_prediction_cache_bytes", "Approximate memory held by cached predictions.")
+
+# Rough per-entry bookkeeping cost of the OrderedDict node and the (value, expiry) tuple.
+_ENTRY_OVERHEAD = 200
+
+
+def _deep_sizeof(value):
+    """``sys.getsizeof`` plus the tuples, lists and dicts (keys and values) nested in ``value``."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_sizeof(k) + _deep_sizeof(v) for k, v in value.items())
+    elif isinstance(value, (tuple, list)):
+        size += sum(_deep_sizeof(item) for item in value)
+    return size
+
+
+def content_key(data: bytes):
+    """Returns the SHA-256 of the uploaded image bytes, used as the cache key."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def model_version(path: str):
+    """Identifies the model artifact on disk by its modification time and size."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+class PredictionCache:
+    """LRU cache with TTL and a memory cap for predictions keyed by image content.
+
+    ``version_fn`` returns the version of the active model; whenever it
+    changes, every cached prediction is dropped.
+    """
+
+    def __init__(self, version_fn, max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+                 max_bytes=PREDICTION_CACHE_MAX_BYTES, ttl=PREDICTION_CACHE_TTL):
+        self._version_fn = version_fn
+        self._version = version_fn()
+        self._next_version_check = time.monotonic() + MODEL_VERSION_CHECK_INTERVAL
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self, now):
+        if now < self._next_version_check:
+            return
+        self._next_version_check = now + MODEL_VERSION_CHECK_INTERVAL
+        version = self._version_fn()
+        if version != self._version:
+            logging.info(f"[CACHE] Model version changed ({self._version} -> {version}); clearing {len(self._entries)} entries.")
+            CACHE_EVICTIONS.labels(reason="model_version").inc(len(self._entries))
+            self._version = version
+            self._entries.clear()
+            self._bytes = 0
+            CACHE_BYTES.set(0)
+
+    def _remove(self, key, reason):
+        value, _, size = self._entries.pop(key)
+        self._bytes -= size
+        CACHE_EVICTIONS.labels(reason=reason).inc()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < now:
+                self._remove(key, "ttl")
+                entry = None
+            if entry is None:
+                CACHE_MISSES.inc()
+                CACHE_BYTES.set(self._bytes)
+                return None
+            self._entries.move_to_end(key)
+            CACHE_HITS.inc()
+            return entry[0]
+
+    def put(self, key, value):
+        now = time.monotonic()
+        size = sys.getsizeof(key) + _deep_sizeof(value) + _ENTRY_OVERHEAD
+        with self._lock:
+            self._check_version(now)
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (value, now + self.ttl, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)), "capacity")
+            CACHE_BYTES.set(self._bytes)
@@ -0,0 +1,122 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from inference.backends import resolve_backend
+from inference.cache import model_version
+from inference.predictor import IMAGE_SIZE, load_model, serving_backend
+
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "15"))
+MODEL_RETIRE_GRACE = float(os.getenv("MODEL_RETIRE_GRACE", "30"))
+WARMUP_BATCH_SIZES = [int(n) for n in os.getenv("WARMUP_BATCH_SIZES", "1").split(",") if n]
+
+MODEL_RELOADS = Counter("rps_model_reloads_total", "Model reload attempts.", ["status"])
+MODEL_LOAD_SECONDS = Gauge("rps_model_load_seconds", "Time taken to load and warm up the active model.")
+
+
+def warm_up(model, batch_sizes=WARMUP_BATCH_SIZES):
+    """Runs throwaway forward passes so graph tracing happens before real traffic."""
+    for batch_size in batch_sizes:
+        model.predict(np.zeros((batch_size, *IMAGE_SIZE, 3), dtype=np.float32))
+
+
+class ModelManager:
+    """Owns the serving model and hot-swaps it when a new one is published.
+
+    A background thread polls the local model artifact. Only that file is
+    watched: training writes the served model there as well as
+    registering it in MLflow, so the registry is not polled. Once a change
+    has been seen unchanged on two consecutive polls (so a file still
+    being written is not picked up), the new model is loaded and warmed up
+    off the request path and then swapped in. Batches that already hold
+    the old model finish on it. The watcher also performs the first load
+    if the initial one failed (e.g. no model trained yet), and ``on_load``
+    is called after every successful activation. A version that fails to
+    load is not retried until the file changes again.
+    """
+
+    def __init__(self, path, backend=None, poll_interval=MODEL_POLL_INTERVAL, on_load=None):
+        self.path = path
+        # Resolved once, so the watched artifact is always the one that gets loaded.
+        self.backend = serving_backend(path, backend)
+        _, self.artifact_path = resolve_backend(path, self.backend)
+        self.poll_interval = poll_interval
+        self.on_load = on_load
+        self._model = None
+        self._version = None
+        self._pending_version = None
+        self._failed_version = None
+        self.timings = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="rps-model-watcher", daemon=True)
+
+    @property
+    def version(self):
+        return self._version
+
+    def get_model(self):
+        return self._model
+
+    def _current_version(self):
+        return model_version(self.artifact_path)
+
+    def load(self):
+        """Loads, warms up and activates the model; returns its version."""
+        version = self._current_version()
+        started = time.perf_counter()
+        model = load_model(self.path, self.backend)
+        loaded = time.perf_counter()
+        warm_up(model)
+        elapsed = time.perf_counter() - started
+        self.timings = {"model_load": loaded - started, "warmup": elapsed - (loaded - started)}
+
+        with self._lock:
+            previous = self._model
+            self._model = model
+            self._version = version
+        if previous is not None and hasattr(previous, "close"):
+            # Models that own processes are closed once in-flight batches had time to finish.
+            retire = threading.Timer(MODEL_RETIRE_GRACE, previous.close)
+            retire.daemon = True
+            retire.start()
+        MODEL_LOAD_SECONDS.set(elapsed)
+        logging.info(f"[MODEL] Activated model version {version} (load + warmup {elapsed:.2f}s).")
+        if self.on_load is not None:
+            self.on_load(self)
+        return version
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join(self.poll_interval)
+        if hasattr(self._model, "close"):
+            self._model.close()
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            version = None
+            try:
+                version = self._current_version()
+                if version == self._version or version == self._failed_version or version is None:
+                    self._pending_version = None
+                    continue
+                if version != self._pending_version:
+                    self._pending_version = version
+                    continue
+                logging.info(f"[MODEL] New model detected ({self._version} -> {version}); reloading.")
+                self.load()
+                MODEL_RELOADS.labels(status="success").inc()
+            except Exception as e:
+                self._failed_version = version
+                MODEL_RELOADS.labels(status="failure").inc()
+                logging.error(f"[MODEL ERROR] Reload of version {version} failed, keeping the current model "
+                              f"until the file changes again: {e}")
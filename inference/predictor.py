@@ -1,23 +1,80 @@
-from keras.models import load_model as keras_load
-from keras.preprocessing import image
+import logging
+import os
+from PIL import Image
 import numpy as np
+import io
+from collections import namedtuple
+
+from inference.backends import BACKEND_EXTENSIONS, load_backend, resolve_backend
 
 CLASS_MAP = {
     1: "rock",
     0: "paper",
     2: "scissors"
 }
+IMAGE_SIZE = (224, 224)
+
+Prediction = namedtuple("Prediction", ["label", "probabilities"])
+
+def serving_backend(path: str, backend=None):
+    """Returns the backend ``load_model`` should use for ``path``; resolve it once and pass it on.
+
+    Worker processes would each load a full TensorFlow runtime for Keras,
+    so in pool mode a ``.tflite`` artifact next to ``path`` is preferred.
+    """
+    from inference.worker_pool import INFERENCE_PROCESSES
+
+    name, _ = resolve_backend(path, backend)
+    if INFERENCE_PROCESSES > 0 and name == "keras":
+        if os.path.exists(os.path.splitext(path)[0] + BACKEND_EXTENSIONS["tflite"]):
+            logging.info("[WORKERS] Using the .tflite artifact instead of Keras in the worker processes.")
+            return "tflite"
+        logging.warning("[WORKERS] No .tflite artifact found; every worker will load its own TensorFlow "
+                        "runtime and Keras model.")
+    return name
+
 
-def load_model(path: str):
-    model = keras_load(path)
+def load_model(path: str, backend=None):
+    from inference.worker_pool import INFERENCE_PROCESSES, WorkerPool
+
+    if INFERENCE_PROCESSES > 0:
+        return WorkerPool(path, backend)
+    model = load_backend(path, backend)
     return model
 
+def decode_image_bytes(data: bytes):
+    """Decodes encoded image bytes straight from memory into a (224, 224, 3) uint8 RGB array."""
+    with Image.open(io.BytesIO(data)) as img:
+        # Lets the JPEG decoder downscale while decoding instead of after.
+        img.draft("RGB", IMAGE_SIZE)
+        img = img.convert("RGB").resize(IMAGE_SIZE, Image.NEAREST)
+        return np.asarray(img, dtype=np.uint8)
+
+def normalize_batch(images, out=None):
+    """Scales uint8 images to [0, 1] float32, reusing ``out`` as the batch buffer when given."""
+    n = len(images)
+    if out is None:
+        out = np.empty((n, *IMAGE_SIZE, 3), dtype=np.float32)
+    batch = out[:n]
+    for i, img in enumerate(images):
+        batch[i] = img
+    np.multiply(batch, 1.0 / 255.0, out=batch)
+    return batch
+
+def load_image_array(image_path: str):
+    with open(image_path, "rb") as f:
+        return decode_image_bytes(f.read())
+
+def to_predictions(pred):
+    class_indices = np.argmax(pred, axis=1)
+    return [
+        Prediction(CLASS_MAP[int(i)], {CLASS_MAP[j]: float(p) for j, p in enumerate(row)})
+        for i, row in zip(class_indices, pred)
+    ]
+
+def predict_batch(batch, model):
+    return to_predictions(model.predict(batch))
+
 def predict_label(image_path: str, model):
-    img = image.load_img(image_path, target_size=(224, 224))
-    x = image.img_to_array(img)
-    x = np.expand_dims(x, axis=0)
-    x /= 255.0
-
-    pred = model.predict(x)
-    class_index = np.argmax(pred, axis=1)[0]
-    return CLASS_MAP[class_index]
+    batch = normalize_batch([load_image_array(image_path)])
+    return predict_batch(batch, model)[0].label
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+from collections import deque, namedtuple
+
+from prometheus_client import Counter
+
+STREAM_MAX_PENDING = int(os.getenv("STREAM_MAX_PENDING", "4"))
+STREAM_SAMPLE_RATE = float(os.getenv("STREAM_SAMPLE_RATE", "0.05"))
+
+STREAM_FRAMES = Counter("rps_stream_frames_total", "Frames received over the streaming endpoint.", ["status"])
+
+Frame = namedtuple("Frame", ["seq", "data", "received_at"])
+
+
+class FrameStream:
+    """Per-connection frame buffer that keeps only the newest frames.
+
+    At most ``max_pending`` frames wait for the model; when a new frame
+    arrives on a full buffer the oldest one is dropped, so a client that
+    sends faster than the model can keep up always gets predictions for
+    recent frames. ``should_sample`` selects a steady ``sample_rate``
+    fraction of predicted frames for persistence.
+    """
+
+    def __init__(self, max_pending=STREAM_MAX_PENDING, sample_rate=STREAM_SAMPLE_RATE):
+        self._frames = deque(maxlen=max_pending)
+        self._available = asyncio.Event()
+        self._closed = False
+        self._seq = 0
+        self._sample_credit = 0.0
+        self.sample_rate = sample_rate
+        self.dropped = 0
+
+    def push(self, data):
+        if len(self._frames) == self._frames.maxlen:
+            self.dropped += 1
+            STREAM_FRAMES.labels(status="dropped").inc()
+        self._frames.append(Frame(self._seq, data, time.perf_counter()))
+        self._seq += 1
+        STREAM_FRAMES.labels(status="received").inc()
+        self._available.set()
+
+    def close(self):
+        self._closed = True
+        self._available.set()
+
+    async def take(self, max_frames):
+        """Waits for at least one frame and returns up to ``max_frames``; ``[]`` once closed."""
+        while not self._frames:
+            if self._closed:
+                return []
+            self._available.clear()
+            await self._available.wait()
+        frames = [self._frames.popleft() for _ in range(min(max_frames, len(self._frames)))]
+        STREAM_FRAMES.labels(status="predicted").inc(len(frames))
+        return frames
+
+    def should_sample(self):
+        self._sample_credit += self.sample_rate
+        if self._sample_credit >= 1.0:
+            self._sample_credit -= 1.0
+            return True
+        return False
@@ -0,0 +1,251 @@
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", "0"))
+INFERENCE_PIN_CORES = os.getenv("INFERENCE_PIN_CORES", "1") == "1"
+INFERENCE_INTER_OP_THREADS = int(os.getenv("INFERENCE_INTER_OP_THREADS", "1"))
+INFERENCE_MAX_INFLIGHT = int(os.getenv("INFERENCE_MAX_INFLIGHT", "2"))
+# Run TFLite kernels straight off the memory-mapped flatbuffer instead of letting the
+# XNNPACK delegate repack the weights into private memory in every worker.
+INFERENCE_SHARE_WEIGHTS = os.getenv("INFERENCE_SHARE_WEIGHTS", "1") == "1"
+INFERENCE_WORKER_START_TIMEOUT = float(os.getenv("INFERENCE_WORKER_START_TIMEOUT", "300"))
+INFERENCE_SUBMIT_TIMEOUT = float(os.getenv("INFERENCE_SUBMIT_TIMEOUT", "30"))
+# How often the result reader checks that every worker process is still alive.
+WORKER_WATCH_INTERVAL = 0.5
+
+
+def _configure_threads(cores, intra_op_threads, inter_op_threads):
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[var] = str(intra_op_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+
+
+def _load_worker_model(path, backend, intra_op_threads, inter_op_threads):
+    from inference.backends import BACKENDS, resolve_backend
+
+    name, artifact_path = resolve_backend(path, backend)
+    if name == "keras":
+        import tensorflow as tf
+
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        return BACKENDS[name](artifact_path)
+    if name == "tflite" and INFERENCE_SHARE_WEIGHTS:
+        return BACKENDS[name](artifact_path, num_threads=intra_op_threads, shared_weights=True)
+    return BACKENDS[name](artifact_path, num_threads=intra_op_threads)
+
+
+def _worker_main(worker_id, path, backend, cores, intra_op_threads, inter_op_threads, tasks, results):
+    _configure_threads(cores, intra_op_threads, inter_op_threads)
+    from inference.predictor import normalize_batch
+
+    try:
+        model = _load_worker_model(path, backend, intra_op_threads, inter_op_threads)
+    except Exception as e:
+        results.put(("failed", worker_id, repr(e)))
+        return
+    results.put(("ready", worker_id, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, images = task
+        try:
+            results.put(("result", task_id, model.predict(normalize_batch(images))))
+        except Exception as e:
+            results.put(("error", task_id, repr(e)))
+    results.put(("exit", worker_id, None))
+
+
+class WorkerPool:
+    """Serves a model from N pinned worker processes behind a least-loaded dispatcher.
+
+    Each worker is a spawned process pinned to its own slice of the
+    available cores, with TensorFlow/TFLite thread counts sized to that
+    slice. With the TFLite backend the flatbuffer is memory-mapped by every
+    worker, so the read-only weights are shared through the page cache
+    instead of being copied per process. ``backend`` is used as given;
+    ``predictor.serving_backend`` picks TFLite over Keras for the pool.
+
+    ``submit`` takes a stack of uint8 images (normalization happens in the
+    worker) and returns a ``Future`` of the class probabilities. It blocks
+    once every worker has ``max_inflight`` batches outstanding, which lets
+    the batcher's bounded queue apply backpressure, and gives up after
+    ``submit_timeout`` seconds. A worker that dies (e.g. OOM-killed) has
+    its outstanding batches failed and is respawned; ``healthy`` turns
+    False once no worker can be brought back.
+    """
+
+    def __init__(self, path, backend=None, num_workers=INFERENCE_PROCESSES, pin_cores=INFERENCE_PIN_CORES,
+                 inter_op_threads=INFERENCE_INTER_OP_THREADS, max_inflight=INFERENCE_MAX_INFLIGHT,
+                 start_timeout=INFERENCE_WORKER_START_TIMEOUT, submit_timeout=INFERENCE_SUBMIT_TIMEOUT):
+        self._ctx = mp.get_context("spawn")
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        per_worker = max(1, len(cores) // num_workers)
+
+        self._path = path
+        self._backend = backend
+        self._pin_cores = pin_cores
+        self._inter_op_threads = inter_op_threads
+        self._worker_cores = [cores[i * per_worker:(i + 1) * per_worker] or cores for i in range(num_workers)]
+        self._submit_timeout = submit_timeout
+        self._results = self._ctx.Queue()
+        self._tasks = [None] * num_workers
+        self._processes = [None] * num_workers
+        self._alive = [False] * num_workers
+        self._outstanding = [0] * num_workers
+        self._futures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(num_workers * max_inflight)
+        self._closed = False
+
+        for worker_id in range(num_workers):
+            self._spawn(worker_id)
+
+        deadline = time.monotonic() + start_timeout
+        pending = set(range(num_workers))
+        while pending:
+            try:
+                status, worker_id, error = self._results.get(timeout=WORKER_WATCH_INTERVAL)
+            except queue.Empty:
+                dead = [i for i in pending if not self._processes[i].is_alive()]
+                if dead or time.monotonic() > deadline:
+                    self._terminate()
+                    reason = f"worker {dead[0]} exited" if dead else f"timed out after {start_timeout:.0f}s"
+                    raise RuntimeError(f"Inference workers failed to start: {reason}")
+                continue
+            if status == "failed":
+                self._terminate()
+                raise RuntimeError(f"Inference worker {worker_id} failed to load the model: {error}")
+            self._alive[worker_id] = True
+            pending.discard(worker_id)
+
+        self._reader = threading.Thread(target=self._read_results, name="rps-inference-results", daemon=True)
+        self._reader.start()
+        logging.info(f"[WORKERS] {num_workers} inference workers ready ({per_worker} core(s) each, pinned={pin_cores}).")
+
+    @property
+    def healthy(self):
+        return not self._closed and any(self._alive)
+
+    def _spawn(self, worker_id):
+        cores = self._worker_cores[worker_id]
+        tasks = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._path, self._backend, cores if self._pin_cores else None,
+                  len(cores), self._inter_op_threads, tasks, self._results),
+            name=f"rps-inference-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._tasks[worker_id] = tasks
+        self._processes[worker_id] = process
+
+    def submit(self, images):
+        if self._closed:
+            raise RuntimeError("Inference worker pool is closed")
+        if not self._slots.acquire(timeout=self._submit_timeout):
+            raise RuntimeError(f"No inference worker accepted a batch within {self._submit_timeout:.0f}s")
+        future = Future()
+        with self._lock:
+            live = [i for i, alive in enumerate(self._alive) if alive]
+            if not live:
+                self._slots.release()
+                raise RuntimeError("No inference worker is alive")
+            worker_id = min(live, key=self._outstanding.__getitem__)
+            self._outstanding[worker_id] += 1
+            task_id = next(self._ids)
+            self._futures[task_id] = (future, worker_id)
+            # Put under the lock so a worker marked dead never receives new work.
+            self._tasks[worker_id].put((task_id, images))
+        return future
+
+    def predict(self, images):
+        return self.submit(images).result()
+
+    def _read_results(self):
+        while True:
+            try:
+                status, key, payload = self._results.get(timeout=WORKER_WATCH_INTERVAL)
+            except queue.Empty:
+                if self._closed and not any(p.is_alive() for p in self._processes):
+                    break
+                self._check_workers()
+                continue
+            if status == "exit":
+                continue
+            if status in ("ready", "failed"):
+                self._worker_restarted(key, status, payload)
+                continue
+            with self._lock:
+                entry = self._futures.pop(key, None)
+                if entry is not None:
+                    self._outstanding[entry[1]] -= 1
+            if entry is None:
+                # Already failed when its worker was declared dead.
+                continue
+            self._slots.release()
+            future, worker_id = entry
+            if status == "result":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"Inference worker {worker_id} failed: {payload}"))
+        self._fail_outstanding(range(len(self._processes)), "Inference worker pool is closed")
+
+    def _check_workers(self):
+        if self._closed:
+            return
+        for worker_id, process in enumerate(self._processes):
+            if self._alive[worker_id] and not process.is_alive():
+                with self._lock:
+                    self._alive[worker_id] = False
+                logging.error(f"[WORKERS] Inference worker {worker_id} died (exit code {process.exitcode}); respawning.")
+                self._fail_outstanding([worker_id], f"Inference worker {worker_id} died")
+                self._spawn(worker_id)
+
+    def _worker_restarted(self, worker_id, status, error):
+        if status == "ready":
+            with self._lock:
+                self._alive[worker_id] = True
+            logging.info(f"[WORKERS] Inference worker {worker_id} respawned.")
+        else:
+            logging.error(f"[WORKERS] Inference worker {worker_id} could not be respawned: {error}")
+
+    def _fail_outstanding(self, worker_ids, reason):
+        worker_ids = set(worker_ids)
+        with self._lock:
+            lost = [(task_id, future) for task_id, (future, worker_id) in self._futures.items() if worker_id in worker_ids]
+            for task_id, _ in lost:
+                del self._futures[task_id]
+            for worker_id in worker_ids:
+                self._outstanding[worker_id] = 0
+        for _, future in lost:
+            self._slots.release()
+            future.set_exception(RuntimeError(reason))
+
+    def close(self):
+        """Lets the workers finish queued batches, then shuts them down."""
+        self._closed = True
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=30)
+        self._terminate()
+        self._reader.join(timeout=5)
+        logging.info("[WORKERS] Inference workers stopped.")
+
+    def _terminate(self):
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
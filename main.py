@@ -1,45 +1,286 @@
-from fastapi import FastAPI, UploadFile, HTTPException, BackgroundTasks
-from prometheus_fastapi_instrumentator import Instrumentator
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 import sys
 import os
-import tempfile
-import shutil
+import asyncio
+import logging
+import threading
+from typing import List
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from inference.predictor import load_model, predict_label
-from Database_connection.db_init import insert_image_record
-from utils.airflow_trigger import trigger_airflow_dag
-from utils.predict_counter import increment_and_check
+from utils.startup import StartupTracker
+
+startup = StartupTracker()
+
+# TensorFlow is not imported here; the selected inference backend imports it
+# on the model loading thread once the server is already accepting requests.
+with startup.phase("imports"):
+    from prometheus_fastapi_instrumentator import Instrumentator
+    from inference.predictor import decode_image_bytes
+    from inference.batcher import MicroBatcher
+    from inference.cache import PredictionCache, content_key
+    from inference.model_manager import ModelManager
+    from inference.batch_input import unpack_uploads
+    from inference.stream import STREAM_FRAMES, FrameStream
+    from Database_connection.db_init import close_pools, insert_image_records
+    from Database_connection.write_behind import RecordWriter
+    from utils.airflow_trigger import airflow_client
+    from utils.predict_counter import increment_and_check
+    from utils.executors import QueueFullError, RETRY_AFTER_SECONDS, inference_executor, persist_executor
 
 
 app = FastAPI(title="Rock Paper Scissors FastAPI Service")
 Instrumentator().instrument(app).expose(app)
 
-MODEL_PATH = "artifacts/rps_model_mobilenet.h5"
+MODEL_PATH = os.getenv("MODEL_PATH", "artifacts/rps_model_mobilenet.h5")
 DB_NAME = "mlops_image_db"
 PERM_TABLE = "image_data"
 TEMP_TABLE = "temp_image_data"
-model = load_model(MODEL_PATH)
 
-@app.post("/predict/")
-async def capture_and_predict(image: UploadFile, background_tasks: BackgroundTasks):
+
+def model_activated(manager):
+    # The first model to go live, whether from the loader thread or the watcher, makes the backend ready.
+    if not startup.ready:
+        for name, seconds in manager.timings.items():
+            startup.record(name, seconds)
+        startup.mark_ready()
+
+
+def advance_retrain_counter(count):
+    """Counts ``count`` stored predictions and triggers a retrain when due; never raises."""
+    try:
+        if increment_and_check(count):
+            airflow_client.submit()
+    except Exception as e:
+        logging.error(f"[DB ERROR] Could not advance the retrain counter by {count}: {e}")
+
+
+model_manager = ModelManager(MODEL_PATH, on_load=model_activated)
+batcher = MicroBatcher(model_manager.get_model).start()
+prediction_cache = PredictionCache(lambda: model_manager.version)
+# The retrain counter advances once per flush, off the request path.
+writer = RecordWriter(DB_NAME, [PERM_TABLE, TEMP_TABLE], on_flush=advance_retrain_counter).start()
+stream_writer = RecordWriter(DB_NAME, [TEMP_TABLE], on_flush=advance_retrain_counter).start()
+
+
+def load_model_in_background():
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-            shutil.copyfileobj(image.file, tmp)
-            img_path = tmp.name
+        model_manager.load()
+    except Exception as e:
+        startup.mark_failed(e)
+    finally:
+        # Started even after a failed load: the watcher picks the model up once it exists.
+        model_manager.start()
+
+
+@app.on_event("startup")
+def start_model_loading():
+    threading.Thread(target=load_model_in_background, name="rps-model-loader", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_workers():
+    batcher.stop()
+    model_manager.stop()
+    inference_executor.shutdown()
+    persist_executor.shutdown()
+    writer.stop()
+    stream_writer.stop()
+    airflow_client.close()
+    close_pools()
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    if not startup.ready:
+        status = "failed" if startup.error else "starting"
+        return JSONResponse(status_code=503, content={"status": status, "error": startup.error, "startup_seconds": startup.phases})
+    if not getattr(model_manager.get_model(), "healthy", True):
+        return JSONResponse(status_code=503, content={"status": "degraded", "error": "no live inference workers"})
+    return {"status": "ready", "model_version": model_manager.version, "startup_seconds": startup.phases}
+
 
-        label = predict_label(img_path, model)
+async def predict_images(blobs):
+    """Returns one ``Prediction`` per image, or the exception raised while decoding it.
 
-        insert_image_record(DB_NAME, PERM_TABLE, img_path, label)
-        insert_image_record(DB_NAME, TEMP_TABLE, img_path, label)
+    Cached images skip the model. The rest are decoded concurrently and
+    submitted to the batcher one chunk at a time, so each chunk lands in
+    the queue together and runs as a single forward pass.
+    """
+    results = [None] * len(blobs)
+    keys = [content_key(b) for b in blobs]
+    for i, key in enumerate(keys):
+        results[i] = prediction_cache.get(key)
+    misses = [i for i, result in enumerate(results) if result is None]
 
-        os.remove(img_path)
-        if increment_and_check():
-            background_tasks.add_task(trigger_airflow_dag)
+    for start in range(0, len(misses), batcher.max_batch_size):
+        chunk = misses[start:start + batcher.max_batch_size]
+        decoded = await asyncio.gather(
+            *(inference_executor.run(decode_image_bytes, blobs[i]) for i in chunk),
+            return_exceptions=True
+        )
+        futures = {}
+        for i, x in zip(chunk, decoded):
+            if isinstance(x, QueueFullError):
+                raise x
+            if isinstance(x, Exception):
+                results[i] = x
+            else:
+                futures[i] = batcher.submit(x)
+        for i, future in futures.items():
+            results[i] = await asyncio.wrap_future(future)
+            prediction_cache.put(keys[i], results[i])
+    return results
 
+
+@app.post("/predict/")
+async def capture_and_predict(image: UploadFile):
+    if not startup.ready:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet", headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    try:
+        image_bytes = await image.read()
+        prediction = (await predict_images([image_bytes]))[0]
+        if isinstance(prediction, Exception):
+            raise prediction
+        label = prediction.label
+        try:
+            writer.submit(image_bytes, label)
+        except QueueFullError:
+            # The database is behind; the prediction is still served and the record counted as dropped.
+            logging.warning("[DB] Write queue full; prediction record not saved.")
         return {"prediction": label}
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/predict/batch")
+async def predict_batch_images(images: List[UploadFile] = File(...)):
+    """Classifies many images, sent as a multipart list and/or zip/tar archives, in one request."""
+    if not startup.ready:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet", headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    try:
+        uploads = [(upload.filename, await upload.read()) for upload in images]
+        files = await inference_executor.run(unpack_uploads, uploads)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch upload: {e}")
+
+    try:
+        predictions = await predict_images([data for _, data in files])
+
+        results = []
+        records = []
+        for (filename, data), prediction in zip(files, predictions):
+            if isinstance(prediction, Exception):
+                results.append({"filename": filename, "error": str(prediction)})
+                continue
+            results.append({"filename": filename, "prediction": prediction.label, "probabilities": prediction.probabilities})
+            records.append((data, prediction.label))
+
+        if records:
+            await persist_executor.run(insert_image_records, DB_NAME, [PERM_TABLE, TEMP_TABLE], records)
+            # The records are stored; counting them must not hold up or fail the response.
+            try:
+                persist_executor.submit(advance_retrain_counter, len(records))
+            except QueueFullError:
+                logging.warning(f"[DB] Persist queue full; {len(records)} batch predictions not counted for retraining.")
+
+        return {"count": len(results), "results": results}
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def record_stream_samples(records):
+    """Queues sampled frames on the stream writer; never blocks, and counts the ones a full queue turns away."""
+    for queued, (image_bytes, label) in enumerate(records):
+        try:
+            stream_writer.submit(image_bytes, label)
+        except QueueFullError:
+            STREAM_FRAMES.labels(status="unsaved").inc(len(records) - queued)
+            logging.warning(f"[DB] Write queue full; {len(records) - queued} stream samples not saved.")
+            return
+
+
+@app.websocket("/ws/predict")
+async def stream_predict(websocket: WebSocket):
+    """Classifies a continuous stream of encoded frames sent as binary messages.
+
+    Frames the model cannot keep up with are dropped in favour of newer
+    ones, the frames waiting at each step are predicted as one batch, and
+    one JSON message is sent back per predicted frame; a batch that fails
+    gets a single ``{"frames": [...], "error": ...}`` message instead. Only a
+    ``STREAM_SAMPLE_RATE`` fraction of frames is kept for retraining. A
+    text message closes the connection with 1003 (unsupported data).
+    """
+    await websocket.accept()
+    if not startup.ready:
+        await websocket.close(code=1013, reason="Model is not loaded yet")
+        return
+
+    stream = FrameStream()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is None:
+                    await websocket.close(code=1003, reason="Frames must be sent as binary messages")
+                    break
+                stream.push(message["bytes"])
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            stream.close()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            frames = await stream.take(batcher.max_batch_size)
+            if not frames:
+                break
+            try:
+                predictions = await predict_images([frame.data for frame in frames])
+            except QueueFullError:
+                # Shed this batch; the client keeps streaming and newer frames follow.
+                stream.dropped += len(frames)
+                continue
+            except Exception as e:
+                # A failed batch is reported to the client; the stream stays open for the next frames.
+                logging.error(f"Stream batch of {len(frames)} frames failed: {e}")
+                STREAM_FRAMES.labels(status="failed").inc(len(frames))
+                await websocket.send_json({"frames": [frame.seq for frame in frames], "error": str(e)})
+                continue
+
+            samples = []
+            for frame, prediction in zip(frames, predictions):
+                if isinstance(prediction, Exception):
+                    await websocket.send_json({"frame": frame.seq, "error": str(prediction)})
+                    continue
+                await websocket.send_json({
+                    "frame": frame.seq,
+                    "prediction": prediction.label,
+                    "probabilities": prediction.probabilities,
+                    "dropped": stream.dropped
+                })
+                if stream.should_sample():
+                    samples.append((frame.data, prediction.label))
+            if samples:
+                record_stream_samples(samples)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the receiver closed the socket (unsupported data) while results were being sent.
+        pass
+    finally:
+        receiver.cancel()
@@ -15,10 +15,17 @@ def validate_and_ingest_image(src_dir,dest_dir):
 
         files=[f for f in os.listdir(src_label_path) if f.lower().endswith(('.png','.jpg','.jpeg'))]
 
+        copied=0
         for f in files:
             src_path=os.path.join(src_label_path,f)
             dest_path=os.path.join(dest_label_path,f)
-            shutil.copy(src_path,dest_path)
-        print(f"Copied {len(files)} images to '{label}' in raw data.")
+            # copy2 keeps the mtime, so an unchanged file can be recognised by size and mtime alone.
+            if os.path.exists(dest_path):
+                src_stat,dest_stat=os.stat(src_path),os.stat(dest_path)
+                if src_stat.st_size==dest_stat.st_size and src_stat.st_mtime_ns==dest_stat.st_mtime_ns:
+                    continue
+            shutil.copy2(src_path,dest_path)
+            copied+=1
+        print(f"Copied {copied} new or changed images to '{label}' in raw data ({len(files)-copied} unchanged).")
     print(f"Data ingestion Done.")
 
@@ -0,0 +1,54 @@
+import os
+import logging
+import numpy as np
+from PIL import Image
+
+CALIBRATION_DIR = "src/main_dataset/sample_example_input"
+TFLITE_QUANTIZE = os.getenv("TFLITE_QUANTIZE", "1") == "1"
+NUM_CALIBRATION_IMAGES = int(os.getenv("NUM_CALIBRATION_IMAGES", "100"))
+
+
+def calibration_images(calibration_dir=CALIBRATION_DIR, limit=NUM_CALIBRATION_IMAGES, target_size=(224, 224)):
+    """Yields preprocessed float32 images from ``calibration_dir`` for INT8 calibration."""
+    count = 0
+    for subdir, _, files in os.walk(calibration_dir):
+        for file in sorted(files):
+            if not file.lower().endswith(('.png', '.jpg', '.jpeg')):
+                continue
+            try:
+                img = Image.open(os.path.join(subdir, file)).convert("RGB").resize(target_size)
+            except Exception as e:
+                logging.warning(f"Skipping calibration image {file}: {e}")
+                continue
+            yield np.asarray(img, dtype=np.float32) / 255.0
+            count += 1
+            if count >= limit:
+                return
+
+
+def convert_to_tflite(model, output_path, quantize=TFLITE_QUANTIZE, calibration_dir=CALIBRATION_DIR):
+    """Converts a Keras model to a TFLite flatbuffer at ``output_path``.
+
+    With ``quantize`` the weights and activations are quantized to INT8
+    (post-training, calibrated on ``calibration_dir``); input and output
+    stay float32 so callers feed the same normalized batches as Keras.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize:
+        def representative_dataset():
+            for img in calibration_images(calibration_dir):
+                yield [np.expand_dims(img, axis=0)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    tflite_model = converter.convert()
+    # Write then rename, so the model watcher never sees a half-written file.
+    with open(output_path + ".tmp", "wb") as f:
+        f.write(tflite_model)
+    os.replace(output_path + ".tmp", output_path)
+    logging.info(f"TFLite model ({'int8' if quantize else 'float32'}, {len(tflite_model) / 1e6:.1f} MB) saved to: {output_path}")
+    return output_path
@@ -0,0 +1,189 @@
+import json
+import os
+import numpy as np
+
+# The packed format and content hashes belong to preprocessing; this package is
+# imported both as ``src.model_making`` and, from the training image, as ``model_making``.
+try:
+    from ..preprocessing.manifest import file_sha256, stat_fingerprint
+    from ..preprocessing.pack_dataset import PACK_INDEX
+except ImportError:
+    from preprocessing.manifest import file_sha256, stat_fingerprint
+    from preprocessing.pack_dataset import PACK_INDEX
+
+IMAGE_SIZE = (224, 224)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Alphabetical, as flow_from_directory ordered them; serving's CLASS_MAP relies on this order.
+CLASSES = ['paper', 'rock', 'scissors']
+TRAIN_BATCH_SIZE = int(os.getenv("TRAIN_BATCH_SIZE", "16"))
+DATA_CACHE_DIR = os.getenv("DATA_CACHE_DIR", "artifacts/data_cache")
+SHUFFLE_SEED = 42
+
+
+def list_images(directory, validation_split=0.2, classes=CLASSES):
+    """Lists ``<directory>/<class>/`` images as ``(classes, train_items, val_items)``.
+
+    Each item is ``(path, class_index)`` with indices taken from
+    ``classes`` (paper=0, rock=1, scissors=2), even when a class has no
+    folder, so a small retraining set keeps the model's output layout.
+    Like ``flow_from_directory`` the first ``validation_split`` of every
+    class's sorted files is held out, so the split is deterministic.
+    """
+    train_items, val_items = [], []
+    for index, label in enumerate(classes):
+        label_dir = os.path.join(directory, label)
+        if not os.path.isdir(label_dir):
+            continue
+        files = sorted(f for f in os.listdir(label_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        split = int(len(files) * validation_split)
+        val_items += [(os.path.join(label_dir, f), index) for f in files[:split]]
+        train_items += [(os.path.join(label_dir, f), index) for f in files[split:]]
+    return classes, train_items, val_items
+
+
+def decode_image_bytes(data, method="nearest"):
+    """Decodes encoded image bytes into a float32 ``IMAGE_SIZE`` RGB tensor scaled to [0, 1]."""
+    import tensorflow as tf
+
+    image = tf.io.decode_image(data, channels=3, expand_animations=False)
+    image = tf.image.resize(image, IMAGE_SIZE, method=method)
+    return tf.cast(image, tf.float32) / 255.0
+
+
+def decode_image(path):
+    """Reads one preprocessed image file; files are already ``IMAGE_SIZE``, so resizing is a no-op."""
+    import tensorflow as tf
+
+    return decode_image_bytes(tf.io.read_file(path))
+
+
+def make_dataset(items, batch_size=TRAIN_BATCH_SIZE, num_classes=None, shuffle=False, cache_file=None):
+    """Builds a batched ``tf.data`` pipeline over ``(path, class_index)`` items.
+
+    Files are decoded in parallel, optionally cached (to ``cache_file`` on
+    disk, so later epochs and runs skip decoding), shuffled and prefetched.
+    With ``num_classes`` the labels are one-hot encoded; without it the
+    dataset yields images only.
+    """
+    import tensorflow as tf
+
+    paths = [path for path, _ in items]
+    if num_classes is None:
+        ds = tf.data.Dataset.from_tensor_slices(paths)
+        ds = ds.map(decode_image, num_parallel_calls=tf.data.AUTOTUNE)
+    else:
+        labels = [index for _, index in items]
+        ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+        ds = ds.map(lambda path, label: (decode_image(path), tf.one_hot(label, num_classes)),
+                    num_parallel_calls=tf.data.AUTOTUNE)
+    if cache_file is not None:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        ds = ds.cache(cache_file)
+    if shuffle:
+        ds = ds.shuffle(len(items), seed=SHUFFLE_SEED, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def is_packed(directory):
+    """True when ``directory`` holds shards written by ``preprocessing.pack_dataset``."""
+    return os.path.exists(os.path.join(directory, PACK_INDEX))
+
+
+class PackedDataset:
+    """Images packed by ``preprocessing.pack_dataset``: memory-mapped uint8 shards plus a JSON label index.
+
+    Items are ``(position, class_index)`` pairs, where ``position`` indexes
+    ``hashes`` and ``read``, so they can be used wherever ``list_images``
+    items are.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, PACK_INDEX)) as f:
+            index = json.load(f)
+        if tuple(index["image_size"]) != IMAGE_SIZE:
+            raise ValueError(f"{directory} is packed at {index['image_size']}, expected {IMAGE_SIZE}")
+        self.shards = [np.load(os.path.join(directory, shard["file"]), mmap_mode="r") for shard in index["shards"]]
+        self.locations, self.labels, self.hashes, self.names = [], [], [], []
+        for shard_no, shard in enumerate(index["shards"]):
+            for row, (label, content_hash, name) in enumerate(zip(shard["labels"], shard["hashes"], shard["names"])):
+                self.locations.append((shard_no, row))
+                self.labels.append(label)
+                self.hashes.append(content_hash)
+                self.names.append(name)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def list_items(self, validation_split=0.2, classes=CLASSES):
+        """Same split as ``list_images``: the first ``validation_split`` of each class, in file-name order.
+
+        Packing appends new images to new shards, so rows are sorted by name
+        here rather than relying on their order in the shards.
+        """
+        train_items, val_items = [], []
+        for index, label in enumerate(classes):
+            positions = sorted((i for i, item_label in enumerate(self.labels) if item_label == label),
+                               key=lambda i: self.names[i])
+            split = int(len(positions) * validation_split)
+            val_items += [(i, index) for i in positions[:split]]
+            train_items += [(i, index) for i in positions[split:]]
+        return classes, train_items, val_items
+
+    def read(self, position):
+        shard_no, row = self.locations[position]
+        return np.asarray(self.shards[shard_no][row])
+
+    def make_dataset(self, items, batch_size=TRAIN_BATCH_SIZE, num_classes=None, shuffle=False):
+        """Like ``make_dataset`` but slices rows out of the shards instead of decoding files."""
+        import tensorflow as tf
+
+        def load(position):
+            image = tf.numpy_function(lambda i: self.read(int(i)), [position], tf.uint8)
+            image.set_shape(IMAGE_SIZE + (3,))
+            return tf.cast(image, tf.float32) / 255.0
+
+        positions = [position for position, _ in items]
+        if num_classes is None:
+            ds = tf.data.Dataset.from_tensor_slices(positions)
+        else:
+            ds = tf.data.Dataset.from_tensor_slices((positions, [index for _, index in items]))
+        # Shuffling positions before loading is free; the rows themselves come straight from the page cache.
+        if shuffle:
+            ds = ds.shuffle(len(items), seed=SHUFFLE_SEED, reshuffle_each_iteration=True)
+        if num_classes is None:
+            ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+        else:
+            ds = ds.map(lambda position, label: (load(position), tf.one_hot(label, num_classes)),
+                        num_parallel_calls=tf.data.AUTOTUNE)
+        return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def load_datasets(directory, batch_size=TRAIN_BATCH_SIZE, validation_split=0.2, cache_dir=DATA_CACHE_DIR):
+    """Returns ``(classes, train_ds, val_ds)`` for a ``<directory>/<class>/`` tree or a packed directory.
+
+    ``val_ds`` may be None. Packed directories need no decode cache.
+    """
+    if is_packed(directory):
+        packed = PackedDataset(directory)
+        classes, train_items, val_items = packed.list_items(validation_split)
+        if not train_items:
+            raise ValueError(f"No training images found in {directory}")
+        train_ds = packed.make_dataset(train_items, batch_size, len(classes), shuffle=True)
+        val_ds = packed.make_dataset(val_items, batch_size, len(classes)) if val_items else None
+        return classes, train_ds, val_ds
+
+    classes, train_items, val_items = list_images(directory, validation_split)
+    if not train_items:
+        raise ValueError(f"No training images found in {directory}")
+
+    def cache_file(subset, items):
+        if cache_dir is None:
+            return None
+        return os.path.join(cache_dir, f"{subset}-{stat_fingerprint([path for path, _ in items])[:16]}")
+
+    train_ds = make_dataset(train_items, batch_size, len(classes), shuffle=True,
+                            cache_file=cache_file("train", train_items))
+    val_ds = None
+    if val_items:
+        val_ds = make_dataset(val_items, batch_size, len(classes), cache_file=cache_file("val", val_items))
+    return classes, train_ds, val_ds
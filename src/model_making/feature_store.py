@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import numpy as np
+
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "artifacts/feature_store")
+# Bump whenever the backbone, its weights or the input preprocessing change:
+# features are only reused within the same version.
+BACKBONE_VERSION = "mobilenet_v2-imagenet-224-rescale255-gap"
+
+
+class FeatureStore:
+    """Frozen-backbone embeddings keyed by image content hash.
+
+    Features are appended as immutable ``.npy`` shards under
+    ``<root>/<backbone_version>/`` and read back memory-mapped; a SQLite
+    index maps each content hash to its shard and row. A retrain therefore
+    only runs the backbone on images it has never seen.
+    """
+
+    def __init__(self, root=FEATURE_STORE_DIR, backbone_version=BACKBONE_VERSION):
+        self.root = os.path.join(root, backbone_version)
+        os.makedirs(self.root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.root, "index.sqlite"))
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS features (
+                content_hash TEXT PRIMARY KEY,
+                shard TEXT NOT NULL,
+                row INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self._index = {
+            content_hash: (shard, row)
+            for content_hash, shard, row in self.conn.execute("SELECT content_hash, shard, row FROM features")
+        }
+        self._shards = {}
+
+    def __contains__(self, content_hash):
+        return content_hash in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def add(self, content_hashes, features):
+        """Stores ``features[i]`` under ``content_hashes[i]`` in a new shard."""
+        if not content_hashes:
+            return
+        shard = f"features-{sum(f.startswith('features-') for f in os.listdir(self.root)):05d}.npy"
+        np.save(os.path.join(self.root, shard), np.asarray(features, dtype=np.float32))
+        rows = [(content_hash, shard, row) for row, content_hash in enumerate(content_hashes)]
+        self.conn.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?)", rows)
+        self.conn.commit()
+        for content_hash, shard, row in rows:
+            self._index[content_hash] = (shard, row)
+
+    def _shard(self, shard):
+        if shard not in self._shards:
+            self._shards[shard] = np.load(os.path.join(self.root, shard), mmap_mode="r")
+        return self._shards[shard]
+
+    def get(self, content_hashes):
+        """Returns the stored features for ``content_hashes`` as one float32 array, in order."""
+        if not content_hashes:
+            return np.zeros((0, 0), dtype=np.float32)
+        rows = [self._shard(shard)[row] for shard, row in (self._index[h] for h in content_hashes)]
+        return np.stack(rows).astype(np.float32, copy=False)
+
+    def close(self):
+        self._shards.clear()
+        self.conn.close()
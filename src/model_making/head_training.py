@@ -0,0 +1,233 @@
+import logging
+import os
+import time
+import numpy as np
+
+from .data_loader import (IMAGE_SIZE, TRAIN_BATCH_SIZE, PackedDataset, decode_image_bytes, file_sha256, is_packed,
+                          list_images, load_datasets, make_dataset)
+from .feature_store import FEATURE_STORE_DIR, FeatureStore
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Set to 0 to train the whole (frozen-backbone) model on images instead, as before the feature store.
+USE_FEATURE_CACHE = os.getenv("USE_FEATURE_CACHE", "1") == "1"
+DEPLOYED_MODEL_PATH = "artifacts/rps_model_mobilenet.h5"
+REGISTERED_MODEL_NAME = "RockPaperScissorsModel"
+WARM_START_LEARNING_RATE = float(os.getenv("WARM_START_LEARNING_RATE", "1e-4"))
+
+
+def build_backbone():
+    from keras.applications import MobileNetV2
+
+    backbone = MobileNetV2(weights='imagenet', include_top=False, input_shape=IMAGE_SIZE + (3,))
+    backbone.trainable = False
+    return backbone
+
+
+def build_head(feature_dim, num_classes, learning_rate=1e-3):
+    from keras.models import Model
+    from keras.layers import Dense, Input
+    from keras.optimizers import Adam
+
+    inputs = Input(shape=(feature_dim,))
+    x = Dense(128, activation="relu")(inputs)
+    outputs = Dense(num_classes, activation="softmax")(x)
+    head = Model(inputs=inputs, outputs=outputs)
+    head.compile(optimizer=Adam(learning_rate=learning_rate), loss="categorical_crossentropy", metrics=["accuracy"])
+    return head
+
+
+def load_warm_start_model(model_path=DEPLOYED_MODEL_PATH, registered_model_name=REGISTERED_MODEL_NAME):
+    """Returns the currently deployed model: the local ``.h5`` if present, else the latest registered version.
+
+    Returns None when neither can be loaded, so callers fall back to a cold start.
+    """
+    if os.path.exists(model_path):
+        try:
+            from keras.models import load_model
+            return load_model(model_path)
+        except Exception as e:
+            logging.warning(f"Could not load {model_path} for warm start: {e}")
+    try:
+        import mlflow.keras
+        return mlflow.keras.load_model(f"models:/{registered_model_name}/latest")
+    except Exception as e:
+        logging.warning(f"Could not load registered model {registered_model_name} for warm start: {e}")
+    return None
+
+
+def head_from_model(model, feature_dim, num_classes):
+    """Builds a head initialized from the two Dense layers on top of a full model's pooled features.
+
+    Only valid because the backbone is frozen ImageNet MobileNetV2, so the
+    deployed head was trained on exactly the features in the store.
+    """
+    head = build_head(feature_dim, num_classes, learning_rate=WARM_START_LEARNING_RATE)
+    head.set_weights(model.layers[-2].get_weights() + model.layers[-1].get_weights())
+    return head
+
+
+def assemble_model(backbone, head):
+    """Stacks the trained head on the frozen backbone into one image-to-softmax model."""
+    from keras.models import Model
+    from keras.layers import GlobalAveragePooling2D
+    from keras.optimizers import Adam
+
+    x = GlobalAveragePooling2D()(backbone.output)
+    for layer in head.layers[1:]:
+        x = layer(x)
+    model = Model(inputs=backbone.input, outputs=x)
+    model.compile(optimizer=Adam(), loss="categorical_crossentropy", metrics=["accuracy"])
+    return model
+
+
+def embed_images(paths, store, backbone, batch_size=EMBED_BATCH_SIZE):
+    """Returns pooled backbone features for ``paths``, running the backbone only on content ``store`` lacks."""
+    from keras.models import Model
+    from keras.layers import GlobalAveragePooling2D
+
+    hashes = [file_sha256(path) for path in paths]
+    missing = {}
+    for content_hash, path in zip(hashes, paths):
+        if content_hash not in store and content_hash not in missing:
+            missing[content_hash] = path
+
+    if missing:
+        started = time.perf_counter()
+        embedder = Model(inputs=backbone.input, outputs=GlobalAveragePooling2D()(backbone.output))
+        # Each image goes through the backbone exactly once, so the decoded images are not cached.
+        dataset = make_dataset([(path, None) for path in missing.values()], batch_size)
+        features = embedder.predict(dataset, verbose=0)
+        store.add(list(missing), features)
+        logging.info(f"Embedded {len(missing)} new images in {time.perf_counter() - started:.1f}s")
+    logging.info(f"Reused cached features for {len(set(hashes)) - len(missing)} images")
+    return store.get(hashes)
+
+
+def embed_packed(packed, positions, store, backbone, batch_size=EMBED_BATCH_SIZE):
+    """Like ``embed_images`` for rows of a ``PackedDataset``, which already carries each image's content hash."""
+    from keras.models import Model
+    from keras.layers import GlobalAveragePooling2D
+
+    hashes = [packed.hashes[position] for position in positions]
+    missing = {}
+    for content_hash, position in zip(hashes, positions):
+        if content_hash not in store and content_hash not in missing:
+            missing[content_hash] = position
+
+    if missing:
+        started = time.perf_counter()
+        embedder = Model(inputs=backbone.input, outputs=GlobalAveragePooling2D()(backbone.output))
+        dataset = packed.make_dataset([(position, None) for position in missing.values()], batch_size)
+        store.add(list(missing), embedder.predict(dataset, verbose=0))
+        logging.info(f"Embedded {len(missing)} new packed images in {time.perf_counter() - started:.1f}s")
+    logging.info(f"Reused cached features for {len(set(hashes)) - len(missing)} images")
+    return store.get(hashes)
+
+
+def embed_blobs(content_hashes, fetch_blobs, store, backbone, batch_size=EMBED_BATCH_SIZE):
+    """Like ``embed_images`` for images stored as bytes: ``fetch_blobs`` is only asked for uncached hashes.
+
+    Raw images are resized bilinearly, as the preprocessing step does.
+    """
+    import tensorflow as tf
+    from keras.models import Model
+    from keras.layers import GlobalAveragePooling2D
+
+    missing = [h for h in dict.fromkeys(content_hashes) if h not in store]
+    if missing:
+        blobs = fetch_blobs(missing)
+        missing = [h for h in missing if h in blobs]
+        if missing:
+            embedder = Model(inputs=backbone.input, outputs=GlobalAveragePooling2D()(backbone.output))
+            dataset = tf.data.Dataset.from_tensor_slices([blobs[h] for h in missing])
+            dataset = dataset.map(lambda data: decode_image_bytes(data, method="bilinear"),
+                                  num_parallel_calls=tf.data.AUTOTUNE)
+            store.add(missing, embedder.predict(dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE), verbose=0))
+    content_hashes = [h for h in content_hashes if h in store]
+    return content_hashes, store.get(content_hashes)
+
+
+def train_head_on_directory(directory, epochs=5, batch_size=TRAIN_BATCH_SIZE, validation_split=0.2,
+                            store_dir=FEATURE_STORE_DIR, use_feature_cache=USE_FEATURE_CACHE,
+                            warm_start=None, replay=None, fetch_replay_blobs=None, patience=None):
+    """Trains the classifier head on cached backbone features of ``directory``.
+
+    ``directory`` is either a ``<directory>/<class>/`` image tree or a
+    directory packed by ``preprocessing.pack_dataset``. Returns ``(model,
+    history)`` where ``model`` is the full MobileNetV2 + head network,
+    ready to save and serve like before. Without ``use_feature_cache`` the
+    full model is fitted on the ``tf.data`` image pipeline instead, with
+    the backbone still frozen.
+
+    ``warm_start`` is a previously trained full model whose head weights
+    are fine-tuned instead of starting from scratch. ``replay`` is a list
+    of ``(label, content_hash)`` older samples mixed into the training
+    set; ``fetch_replay_blobs(hashes)`` returns ``{hash: image_bytes}`` for
+    those not in the feature store yet. With ``patience`` training stops
+    once the validation loss (training loss without a validation set)
+    has not improved for that many epochs, keeping the best weights. Warm
+    starts and replay always use the feature store.
+    """
+    from keras.callbacks import EarlyStopping
+    from keras.utils import to_categorical
+
+    callbacks = []
+    if not use_feature_cache and warm_start is None and not replay:
+        classes, train_ds, val_ds = load_datasets(directory, batch_size, validation_split)
+        backbone = build_backbone()
+        model = assemble_model(backbone, build_head(backbone.output_shape[-1], len(classes)))
+        if patience is not None:
+            callbacks.append(EarlyStopping(monitor="val_loss" if val_ds is not None else "loss",
+                                           patience=patience, restore_best_weights=True))
+        return model, model.fit(train_ds, epochs=epochs, validation_data=val_ds, callbacks=callbacks)
+
+    if is_packed(directory):
+        packed = PackedDataset(directory)
+        classes, train_items, val_items = packed.list_items(validation_split)
+
+        def embed(items):
+            return embed_packed(packed, [position for position, _ in items], store, backbone)
+    else:
+        classes, train_items, val_items = list_images(directory, validation_split)
+
+        def embed(items):
+            return embed_images([path for path, _ in items], store, backbone)
+    if not train_items:
+        raise ValueError(f"No training images found in {directory}")
+
+    backbone = build_backbone()
+    store = FeatureStore(store_dir)
+    try:
+        x_train = embed(train_items)
+        x_val = embed(val_items) if val_items else None
+        y_train = [index for _, index in train_items]
+        if replay:
+            replay_labels = {content_hash: classes.index(label) for label, content_hash in replay if label in classes}
+            replay_hashes, x_replay = embed_blobs(list(replay_labels), fetch_replay_blobs, store, backbone)
+            if replay_hashes:
+                x_train = np.concatenate([x_train, x_replay])
+                y_train += [replay_labels[h] for h in replay_hashes]
+            logging.info(f"Mixed {len(replay_hashes)} replay samples into {len(train_items)} new training images")
+    finally:
+        store.close()
+
+    y_train = to_categorical(y_train, len(classes))
+    validation_data = None
+    if val_items:
+        validation_data = (x_val, to_categorical([index for _, index in val_items], len(classes)))
+
+    head = None
+    if warm_start is not None:
+        try:
+            head = head_from_model(warm_start, x_train.shape[1], len(classes))
+            logging.info("Warm-starting from the deployed model's head")
+        except ValueError as e:
+            logging.warning(f"Deployed model does not match the head layout, training from scratch: {e}")
+    if head is None:
+        head = build_head(x_train.shape[1], len(classes))
+    if patience is not None:
+        callbacks.append(EarlyStopping(monitor="val_loss" if validation_data is not None else "loss",
+                                       patience=patience, restore_best_weights=True))
+    history = head.fit(x_train, y_train, batch_size=batch_size, epochs=epochs, validation_data=validation_data,
+                       callbacks=callbacks)
+    return assemble_model(backbone, head), history
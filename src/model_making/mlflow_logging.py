@@ -0,0 +1,55 @@
+import logging
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+MODEL_ARTIFACT_PATH = "rps_cnn_model"
+PIP_REQUIREMENTS = [
+    "tensorflow-cpu==2.13.0",
+    "keras==2.13.1",
+    "mlflow==2.4.1",
+    "pandas",
+    "pillow==10.0.0"
+]
+
+
+def model_signature(model):
+    """Builds the MLflow signature from the model's static input/output shapes; no forward pass needed."""
+    from mlflow.models.signature import ModelSignature
+    from mlflow.types.schema import Schema, TensorSpec
+
+    def spec(shape):
+        return Schema([TensorSpec(np.dtype(np.float32), tuple(-1 if dim is None else dim for dim in shape))])
+
+    return ModelSignature(inputs=spec(model.input_shape), outputs=spec(model.output_shape))
+
+
+def save_and_log_model(model, model_path, artifact_path=MODEL_ARTIFACT_PATH):
+    """Saves ``model`` once as an HDF5 MLflow model, uploads it and installs its ``.h5`` at ``model_path``.
+
+    The uploaded artifact is what ``register_model`` registers, and
+    ``model_path`` is the file the backend serves. Both now come from a
+    single save. Returns the seconds spent.
+    """
+    import mlflow
+    import mlflow.keras
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        local_path = os.path.join(tmp_dir, artifact_path)
+        mlflow.keras.save_model(
+            model,
+            local_path,
+            signature=model_signature(model),
+            pip_requirements=PIP_REQUIREMENTS,
+            save_format="h5"
+        )
+        # Copy then rename, so the model watcher never sees a half-written file.
+        shutil.copyfile(os.path.join(local_path, "data", "model.h5"), model_path + ".tmp")
+        os.replace(model_path + ".tmp", model_path)
+        mlflow.log_artifacts(local_path, artifact_path=artifact_path)
+    elapsed = time.perf_counter() - started
+    logging.info(f"Model saved to {model_path} and logged to MLflow in {elapsed:.1f}s")
+    return elapsed
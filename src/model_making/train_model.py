@@ -1,18 +1,9 @@
 import os
 import sys
+import time
 import mlflow
-import mlflow.keras
-import numpy as np
 import logging
 import warnings as w
-from PIL import Image
-from keras.preprocessing.image import ImageDataGenerator
-from keras.applications import MobileNetV2
-from keras.models import Model
-from keras.layers import Dense, GlobalAveragePooling2D
-from keras.optimizers import Adam
-from mlflow.models.signature import infer_signature
-import tensorflow as tf
 
 w.filterwarnings('ignore')
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,46 +11,24 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from data_ingestion.ingestion import validate_and_ingest_image
 from preprocessing.preprocess_image import preprocess_images
+from preprocessing.pack_dataset import pack_directory
+from model_making.convert_model import convert_to_tflite
+from model_making.head_training import train_head_on_directory
+from model_making.mlflow_logging import save_and_log_model
 
 def train_and_log_model():
     validate_and_ingest_image("src/main_dataset/main_raw_data", "Data/raw_data")
     preprocess_images("Data/raw_data", "Data/src_preprocessed_data")
+    pack_directory("Data/src_preprocessed_data", "Data/src_packed_data")
 
     mlflow.set_tracking_uri("http://mlflow:5000")
     mlflow.set_experiment("play-rock-paper-scissors-exp")
 
-    datagen = ImageDataGenerator(validation_split=0.2, rescale=1. / 255)
-
-    train_generator = datagen.flow_from_directory(
-        "Data/src_preprocessed_data",
-        target_size=(224, 224),
-        batch_size=16,
-        subset="training",
-        class_mode="categorical"
-    )
-
-    val_generator = datagen.flow_from_directory(
-        "Data/src_preprocessed_data",
-        target_size=(224, 224),
-        batch_size=16,
-        subset="validation",
-        class_mode="categorical"
-    )
-
-    base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
-    x = base_model.output
-    x = GlobalAveragePooling2D()(x)
-    x = Dense(128, activation="relu")(x)
-    predictions = Dense(3, activation="softmax")(x)
-    model = Model(inputs=base_model.input, outputs=predictions)
-
-    for layer in base_model.layers:
-        layer.trainable = False
-
-    model.compile(optimizer=Adam(), loss="categorical_crossentropy", metrics=["accuracy"])
-
     with mlflow.start_run():
-        history = model.fit(train_generator, epochs=5, validation_data=val_generator)
+        started = time.perf_counter()
+        # The backbone is frozen, so only the head is trained, on cached backbone features.
+        model, history = train_head_on_directory("Data/src_packed_data", epochs=5)
+        mlflow.log_metric("train_seconds", time.perf_counter() - started)
 
         mlflow.log_param("base_model", "MobileNetV2")
         mlflow.log_param("epochs", 5)
@@ -70,49 +39,15 @@ def train_and_log_model():
         artifact_dir = os.path.abspath("artifacts")
         os.makedirs(artifact_dir, exist_ok=True)
         model_path = os.path.join(artifact_dir, "rps_model_mobilenet.h5")
-        model.save(model_path)
-        logging.info(f"Model saved to: {model_path}")
-
-        sample_path = "src/main_dataset/sample_example_input"
-        x_sample = []
-
-        for subdir, _, files in os.walk(sample_path):
-            for file in files:
-                if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    try:
-                        img_path = os.path.join(subdir, file)
-                        img = Image.open(img_path).convert("RGB").resize((224, 224))
-                        x_sample.append(np.array(img) / 255.0)
-                        if len(x_sample) == 5:
-                            break
-                    except Exception as e:
-                        logging.warning(f"Skipping image due to error: {file} -> {e}")
-            if len(x_sample) == 5:
-                break
-
-        if len(x_sample) == 0:
-            raise ValueError("No valid sample images found in sample_example_input.")
-
-        x_sample = np.array(x_sample)
-        if x_sample.ndim == 3:
-            x_sample = np.expand_dims(x_sample, axis=0)
-
-        tf.config.run_functions_eagerly(True)
-        preds_sample = model.predict(x_sample)
-        signature = infer_signature(x_sample, preds_sample)
-
-        mlflow.keras.log_model(
-            model,
-            artifact_path="rps_cnn_model",
-            signature=signature,
-            pip_requirements=[
-                "tensorflow-cpu==2.13.0",
-                "keras==2.13.1",
-                "mlflow==2.4.1",
-                "pandas",
-                "pillow==10.0.0"
-            ]
-        )
+        mlflow.log_metric("log_model_seconds", save_and_log_model(model, model_path))
+
+        try:
+            started = time.perf_counter()
+            tflite_path = convert_to_tflite(model, os.path.splitext(model_path)[0] + ".tflite")
+            mlflow.log_artifact(tflite_path, artifact_path="rps_tflite_model")
+            mlflow.log_metric("tflite_seconds", time.perf_counter() - started)
+        except Exception as e:
+            logging.warning(f"TFLite conversion failed, serving stays on the Keras model: {e}")
 
         logging.info("Model successfully logged to MLflow.")
 
@@ -1,5 +1,8 @@
 import cv2
-def is_blurr(image,threshold=50.0):
+from .quality import blur_score
+def is_blurr(image,threshold=50.0,max_side=224):
     gray=cv2.cvtColor(image,cv2.COLOR_RGB2GRAY)
-    laplacian_var=cv2.Laplacian(gray,cv2.CV_64F).var()
-    return laplacian_var<threshold
\ No newline at end of file
+    scale=max_side/max(gray.shape)
+    if scale<1:
+        gray=cv2.resize(gray,None,fx=scale,fy=scale,interpolation=cv2.INTER_AREA)
+    return blur_score(gray)<threshold
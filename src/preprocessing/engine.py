@@ -0,0 +1,170 @@
+import cv2
+import hashlib
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .manifest import Manifest, params_key
+from .quality import gate_reason, near_duplicates, quality_scores
+
+EXPECTED_LABELS = ['rock', 'paper', 'scissors']
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def _init_worker():
+    # Each process handles one image at a time; OpenCV's own threads would only oversubscribe the cores.
+    cv2.setNumThreads(1)
+
+
+def _preprocess_one(task):
+    """Reads, resizes, scores and writes one image; returns ``(task, ok, content_hash, scores)``.
+
+    The image is scored on the resized copy, and only written if it passes
+    the quality gate given with the task (``None`` writes unconditionally).
+    """
+    label, img_path, output_img_path, target_size, gate = task
+    with open(img_path, "rb") as f:
+        data = f.read()
+    content_hash = hashlib.sha256(data).hexdigest()
+    # imdecode yields BGR and imwrite expects BGR, so no colour conversion is needed.
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        print(f"[Skip] Unreadable image: {img_path}")
+        return task, False, content_hash, None
+    resized = cv2.resize(image, tuple(target_size))
+    scores = quality_scores(resized)
+    if gate is not None and gate_reason(scores, **gate) is not None:
+        return task, False, content_hash, scores
+    return task, cv2.imwrite(output_img_path, resized), content_hash, scores
+
+
+def _run(tasks, workers):
+    """Yields ``_preprocess_one`` results, across a process pool unless that would not pay off."""
+    if workers <= 1 or len(tasks) < 2:
+        yield from map(_preprocess_one, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        yield from pool.map(_preprocess_one, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+
+
+def collect_tasks(input_dir, output_dir, target_size):
+    tasks = []
+    for label in EXPECTED_LABELS:
+        input_path = os.path.join(input_dir, label)
+        output_path = os.path.join(output_dir, label)
+
+        if not os.path.exists(input_path):
+            print(f"[Skip] Missing folder: {label}")
+            continue
+        os.makedirs(output_path, exist_ok=True)
+
+        for img_name in sorted(os.listdir(input_path)):
+            if img_name.lower().endswith(IMAGE_EXTENSIONS):
+                tasks.append((label, os.path.join(input_path, img_name), os.path.join(output_path, img_name), target_size))
+    return tasks
+
+
+def preprocess_directory(input_dir, output_dir, target_size=(224, 224), workers=PREPROCESS_WORKERS, incremental=True,
+                         blur_threshold=None, brightness_range=None, max_clipped=None, near_duplicate_distance=None):
+    """Resizes every ``<input_dir>/<label>/`` image into ``<output_dir>/<label>/`` across a process pool.
+
+    Returns the number of images saved per label. With ``workers <= 1`` the
+    images are processed in this process and OpenCV keeps its internal
+    threading. With ``incremental`` a manifest in ``output_dir`` records
+    the source, content hash, parameters and quality scores of every
+    output; only new or changed sources are processed and outputs whose
+    source disappeared are deleted.
+
+    Every image is scored for blur, exposure and a perceptual hash while
+    it is processed. Images below ``blur_threshold`` (Laplacian variance
+    of the resized greyscale image), outside ``brightness_range`` or with
+    more than ``max_clipped`` of their pixels clipped are left out, as is
+    every image within ``near_duplicate_distance`` hash bits of an earlier
+    one of the same label; each check is off while its argument is None.
+    Because the scores are cached, changing these thresholds only adds or
+    removes outputs; unchanged images are not decoded again.
+    """
+    if not os.path.exists(input_dir):
+        raise FileNotFoundError(f"Input directory not found: {input_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    gate = {"blur_threshold": blur_threshold, "brightness_range": brightness_range, "max_clipped": max_clipped}
+    tasks = [task + (gate,) for task in collect_tasks(input_dir, output_dir, target_size)]
+    params = params_key(target_size=list(target_size))
+    manifest = Manifest.for_output_dir(output_dir) if incremental else None
+    saved = {label: 0 for label in EXPECTED_LABELS}
+    started = time.perf_counter()
+
+    scores = {}
+    todo = []
+    for task in tasks:
+        cached = None
+        if manifest is not None and manifest.source_unchanged(task[1], task[2], params):
+            cached = manifest.cached_scores(task[2])
+        if cached is None:
+            todo.append(task)
+        else:
+            scores[task[2]] = cached
+
+    written = set()
+    for (label, img_path, output_img_path, _, _), ok, content_hash, image_scores in _run(todo, workers):
+        if image_scores is None:
+            continue
+        scores[output_img_path] = image_scores
+        if ok:
+            written.add(output_img_path)
+        if manifest is not None:
+            manifest.record(img_path, output_img_path, content_hash, params, label)
+            manifest.record_scores(content_hash, image_scores)
+
+    # Decide the kept set over every scored image, new or cached.
+    rejected = {"blurry": 0, "exposure": 0, "near_duplicate": 0}
+    accepted = set()
+    for output_img_path, image_scores in scores.items():
+        reason = gate_reason(image_scores, **gate)
+        if reason is None:
+            accepted.add(output_img_path)
+        else:
+            rejected[reason] += 1
+    if near_duplicate_distance is not None:
+        for label in EXPECTED_LABELS:
+            paths = sorted(task[2] for task in tasks if task[0] == label and task[2] in accepted)
+            duplicate = near_duplicates([scores[path]["dhash"] for path in paths], near_duplicate_distance)
+            for path, is_duplicate in zip(paths, duplicate):
+                if is_duplicate:
+                    accepted.discard(path)
+                    rejected["near_duplicate"] += 1
+
+    # Bring the output directory in line: drop rejected outputs and rebuild
+    # accepted ones that are missing, e.g. after a threshold was relaxed.
+    regenerate = []
+    for task in tasks:
+        exists = os.path.exists(task[2])
+        if task[2] not in accepted and exists:
+            os.remove(task[2])
+        elif task[2] in accepted and not exists:
+            regenerate.append(task[:4] + (None,))
+    for (label, _, output_img_path, _, _), ok, _, _ in _run(regenerate, workers):
+        if ok:
+            written.add(output_img_path)
+
+    for task in tasks:
+        if task[2] in written and task[2] in accepted:
+            saved[task[0]] += 1
+
+    pruned = 0
+    if manifest is not None:
+        pruned = manifest.prune({task[2] for task in tasks})
+        manifest.close()
+
+    elapsed = time.perf_counter() - started
+    total = sum(saved.values())
+    for label, count in saved.items():
+        print(f"[{label.upper()}] Saved: {count}")
+    print(f"[Quality] Kept {len(accepted)}/{len(scores)} scored images; rejected {rejected}")
+    print(f"[Preprocess] {total}/{len(todo)} changed images processed ({len(tasks) - len(todo)} unchanged, "
+          f"{pruned} stale outputs removed) in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed > 0 else 0:.1f} images/s, {workers} worker(s))")
+    return saved
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+MANIFEST_NAME = ".preprocess_manifest.sqlite"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stat_fingerprint(paths, seed=b""):
+    """Hashes each path with its size and mtime: changes whenever a file is added, removed or rewritten."""
+    digest = hashlib.sha256(seed)
+    for path in paths:
+        st = os.stat(path)
+        digest.update(f"{path}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def params_key(**params):
+    """Serializes preprocessing parameters so that any change forces reprocessing."""
+    return json.dumps(params, sort_keys=True)
+
+
+class Manifest:
+    """SQLite index of preprocessed outputs: which source, content hash and parameters produced each file.
+
+    Quality-gate scores are stored per content hash alongside, so gate
+    thresholds can change without decoding any unchanged image again.
+
+    Source files are first compared by size and mtime; only when those
+    changed is the content hash recomputed, so an unchanged dataset costs
+    one ``stat`` per image.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                output_path TEXT PRIMARY KEY,
+                source_path TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                source_size INTEGER NOT NULL,
+                source_mtime_ns INTEGER NOT NULL,
+                params TEXT NOT NULL,
+                label TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                content_hash TEXT PRIMARY KEY,
+                blur REAL NOT NULL,
+                brightness REAL NOT NULL,
+                clipped REAL NOT NULL,
+                dhash TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self._entries = {
+            row[0]: row for row in self.conn.execute(
+                "SELECT output_path, source_path, content_hash, source_size, source_mtime_ns, params FROM entries"
+            )
+        }
+        self._scores = {
+            row[0]: {"blur": row[1], "brightness": row[2], "clipped": row[3], "dhash": int(row[4], 16)}
+            for row in self.conn.execute("SELECT content_hash, blur, brightness, clipped, dhash FROM scores")
+        }
+
+    @classmethod
+    def for_output_dir(cls, output_dir):
+        return cls(os.path.join(output_dir, MANIFEST_NAME))
+
+    def is_current(self, source_path, output_path, params):
+        """True when ``output_path`` was built from the current content of ``source_path`` with ``params``."""
+        return os.path.exists(output_path) and self.source_unchanged(source_path, output_path, params)
+
+    def source_unchanged(self, source_path, output_path, params):
+        """True when ``source_path`` was last processed into ``output_path`` with ``params`` and has not changed since.
+
+        Unlike ``is_current`` the output itself need not exist, since images
+        rejected by the quality gate are recorded without one.
+        """
+        entry = self._entries.get(output_path)
+        if entry is None or entry[1] != source_path or entry[5] != params:
+            return False
+        st = os.stat(source_path)
+        if (entry[3], entry[4]) == (st.st_size, st.st_mtime_ns):
+            return True
+        if file_sha256(source_path) != entry[2]:
+            return False
+        # Same bytes with a new mtime (e.g. re-copied): remember the new stat and keep the output.
+        self.conn.execute(
+            "UPDATE entries SET source_size = ?, source_mtime_ns = ? WHERE output_path = ?",
+            (st.st_size, st.st_mtime_ns, output_path)
+        )
+        return True
+
+    def record(self, source_path, output_path, content_hash, params, label):
+        st = os.stat(source_path)
+        row = (output_path, source_path, content_hash, st.st_size, st.st_mtime_ns, params, label, time.time())
+        self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+        self._entries[output_path] = row[:6]
+
+    def cached_scores(self, output_path):
+        """Quality scores of the source content last recorded for ``output_path``, or None."""
+        entry = self._entries.get(output_path)
+        return None if entry is None else self._scores.get(entry[2])
+
+    def record_scores(self, content_hash, scores):
+        row = (content_hash, scores["blur"], scores["brightness"], scores["clipped"], f"{scores['dhash']:016x}")
+        self.conn.execute("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)", row)
+        self._scores[content_hash] = scores
+
+    def prune(self, keep_outputs):
+        """Deletes outputs (and their entries) that are no longer produced by any current source."""
+        stale = [path for path in self._entries if path not in keep_outputs]
+        for output_path in stale:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            self.conn.execute("DELETE FROM entries WHERE output_path = ?", (output_path,))
+            del self._entries[output_path]
+        # Scores are keyed by content, so they go once no remaining entry references that content.
+        live_hashes = {entry[2] for entry in self._entries.values()}
+        for content_hash in [h for h in self._scores if h not in live_hashes]:
+            self.conn.execute("DELETE FROM scores WHERE content_hash = ?", (content_hash,))
+            del self._scores[content_hash]
+        return len(stale)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,161 @@
+import cv2
+import functools
+import glob
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+from .engine import EXPECTED_LABELS, IMAGE_EXTENSIONS
+from .manifest import stat_fingerprint
+
+PACK_INDEX = "index.json"
+PACK_SHARD_SIZE = int(os.getenv("PACK_SHARD_SIZE", "1024"))
+
+
+def _list_files(input_dir):
+    files = []
+    for label in sorted(EXPECTED_LABELS):
+        label_dir = os.path.join(input_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append((label, os.path.join(label_dir, name)))
+    return files
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _decode(path, height, width):
+    """Returns ``(rgb_image, content_hash)`` for an image file, or None when it cannot be decoded."""
+    with open(path, "rb") as f:
+        data = f.read()
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        print(f"[Skip] Unreadable image: {path}")
+        return None
+    if image.shape[:2] != (height, width):
+        image = cv2.resize(image, (width, height))
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), hashlib.sha256(data).hexdigest()
+
+
+def _write_shard(output_dir, name, members, height, width):
+    """Writes ``members`` ``(label, file_name, stat, load)`` to shard ``name``; ``load()`` is ``_decode``-like."""
+    tmp_path = os.path.join(output_dir, name + ".tmp")
+    images = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(members), height, width, 3))
+    shard = {"file": name, "labels": [], "hashes": [], "names": [], "stats": []}
+    for label, file_name, stat, load in members:
+        loaded = load()
+        if loaded is None:
+            continue
+        image, content_hash = loaded
+        images[len(shard["labels"])] = image
+        shard["labels"].append(label)
+        shard["hashes"].append(content_hash)
+        shard["names"].append(file_name)
+        shard["stats"].append(stat)
+    images.flush()
+    count = len(shard["labels"])
+    if count < len(members):
+        np.save(tmp_path + ".npy", images[:count])
+        del images
+        os.replace(tmp_path + ".npy", tmp_path)
+    else:
+        del images
+    os.replace(tmp_path, os.path.join(output_dir, name))
+    return shard
+
+
+def pack_directory(input_dir, output_dir, target_size=(224, 224), shard_size=PACK_SHARD_SIZE):
+    """Packs ``<input_dir>/<label>/`` images into a few large uint8 shards in ``output_dir``.
+
+    Each shard ``images-NNNNN.npy`` holds up to ``shard_size`` RGB images
+    of ``target_size`` and can be read memory-mapped; ``index.json`` lists
+    the label, content hash, file name and size/mtime of every row.
+
+    Packing is append-only, so a retrain only adds a few files for DVC to
+    push: shards whose images are all unchanged are kept as they are, only
+    new images are decoded, and a shard that lost members (or the last,
+    partly filled one when images are added) is rewritten under a new
+    name by copying its remaining rows. Returns the index.
+    """
+    if not os.path.exists(input_dir):
+        raise FileNotFoundError(f"Input directory not found: {input_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+    index_path = os.path.join(output_dir, PACK_INDEX)
+
+    files = _list_files(input_dir)
+    fingerprint = stat_fingerprint([path for _, path in files], seed=json.dumps(list(target_size)).encode())
+    index = None
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("fingerprint") == fingerprint:
+            print(f"[Pack] {output_dir} is up to date ({index['count']} images)")
+            return index
+
+    started = time.perf_counter()
+    width, height = target_size
+    current = {(label, os.path.basename(path)): (path, _stat_key(path)) for label, path in files}
+    old_shards = index["shards"] if index is not None and index.get("image_size") == [height, width] else []
+
+    # Shards written before sizes/mtimes were recorded have no "stats" and are repacked once.
+    kept, rebuilt, packed = [], [], set()
+    for shard in old_shards:
+        members = list(zip(shard["labels"], shard["names"], shard.get("stats", [None] * len(shard["labels"]))))
+        rows = [row for row, (label, name, stat) in enumerate(members)
+                if stat is not None and current.get((label, name), (None, None))[1] == stat]
+        packed.update(members[row][:2] for row in rows)
+        if len(rows) == len(members):
+            kept.append(shard)
+        elif rows:
+            rebuilt.append((shard, rows))
+    new_files = [(label, name) for label, name in current if (label, name) not in packed]
+    if new_files and kept and len(kept[-1]["labels"]) < shard_size:
+        partial = kept.pop()
+        rebuilt.append((partial, list(range(len(partial["labels"])))))
+
+    def copy_row(source, row, content_hash):
+        return np.asarray(source[row]), content_hash
+
+    members = []
+    for shard, rows in rebuilt:
+        source = np.load(os.path.join(output_dir, shard["file"]), mmap_mode="r")
+        members += [(shard["labels"][row], shard["names"][row], shard["stats"][row],
+                     functools.partial(copy_row, source, row, shard["hashes"][row])) for row in rows]
+    for label, name in new_files:
+        path, stat = current[(label, name)]
+        members.append((label, name, stat, functools.partial(_decode, path, height, width)))
+
+    used = [int(shard["file"][len("images-"):-len(".npy")]) for shard in old_shards]
+    next_no = max(used, default=-1) + 1
+    shards = list(kept)
+    for start in range(0, len(members), shard_size):
+        shards.append(_write_shard(output_dir, f"images-{next_no:05d}.npy", members[start:start + shard_size],
+                                   height, width))
+        next_no += 1
+
+    index = {
+        "image_size": [height, width],
+        "count": sum(len(shard["labels"]) for shard in shards),
+        "fingerprint": fingerprint,
+        "shards": shards
+    }
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(index_path + ".tmp", index_path)
+
+    # Replaced shards are removed only once the new index no longer points at them.
+    live = {shard["file"] for shard in shards}
+    for stale in glob.glob(os.path.join(output_dir, "images-*.npy")):
+        if os.path.basename(stale) not in live:
+            os.remove(stale)
+    print(f"[Pack] {index['count']} images in {len(shards)} shard(s): kept {len(kept)}, "
+          f"rewrote {len(shards) - len(kept)}, decoded {len(new_files)} new image(s) "
+          f"in {time.perf_counter() - started:.2f}s")
+    return index
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+# Exposure gate: mean grey level must fall inside this range and at most this
+# fraction of pixels may be crushed to black or blown out to white.
+BRIGHTNESS_RANGE = (20.0, 235.0)
+MAX_CLIPPED_FRACTION = 0.5
+
+
+def blur_score(gray):
+    """Variance of the Laplacian of a uint8 grayscale image; lower means blurrier."""
+    laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+    _, std = cv2.meanStdDev(laplacian)
+    return float(std[0][0] ** 2)
+
+
+def dhash(gray):
+    """64-bit difference hash: nearly identical images differ in only a few bits."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def quality_scores(image_bgr):
+    """Scores blur, exposure and a perceptual hash on an already downscaled BGR image."""
+    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+    clipped = np.count_nonzero((gray <= 5) | (gray >= 250)) / gray.size
+    return {
+        "blur": blur_score(gray),
+        "brightness": float(gray.mean()),
+        "clipped": float(clipped),
+        "dhash": dhash(gray)
+    }
+
+
+def gate_reason(scores, blur_threshold=None, brightness_range=BRIGHTNESS_RANGE, max_clipped=MAX_CLIPPED_FRACTION):
+    """Returns why an image fails the quality gate, or None if it passes."""
+    if blur_threshold is not None and scores["blur"] < blur_threshold:
+        return "blurry"
+    if brightness_range is not None and not brightness_range[0] <= scores["brightness"] <= brightness_range[1]:
+        return "exposure"
+    if max_clipped is not None and scores["clipped"] > max_clipped:
+        return "exposure"
+    return None
+
+
+def _popcount64(values):
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+
+def near_duplicates(hashes, max_distance):
+    """Flags every image whose dHash is within ``max_distance`` bits of an earlier, kept image."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    duplicate = np.zeros(len(hashes), dtype=bool)
+    for i in range(len(hashes)):
+        if duplicate[i]:
+            continue
+        later = slice(i + 1, len(hashes))
+        duplicate[later] |= _popcount64(hashes[later] ^ hashes[i]) <= max_distance
+    return duplicate
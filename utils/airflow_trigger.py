@@ -1,24 +1,133 @@
-import requests
 import datetime
-import base64
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def trigger_airflow_dag():
-    url = "http://airflow:8080/api/v1/dags/rock_paper_scissors_retrain_pipeline/dagRuns"
+from prometheus_client import Counter, Histogram
+
+AIRFLOW_API_URL = os.getenv("AIRFLOW_API_URL", "http://airflow:8080/api/v1")
+AIRFLOW_USER = os.getenv("AIRFLOW_USER", "admin")
+AIRFLOW_PASSWORD = os.getenv("AIRFLOW_PASSWORD", "admin")
+RETRAIN_DAG_ID = "rock_paper_scissors_retrain_pipeline"
+AIRFLOW_CONNECT_TIMEOUT = float(os.getenv("AIRFLOW_CONNECT_TIMEOUT", "3"))
+AIRFLOW_READ_TIMEOUT = float(os.getenv("AIRFLOW_READ_TIMEOUT", "10"))
+AIRFLOW_RETRIES = int(os.getenv("AIRFLOW_RETRIES", "3"))
+AIRFLOW_BACKOFF = float(os.getenv("AIRFLOW_BACKOFF", "0.5"))
+AIRFLOW_TRIGGER_COOLDOWN = float(os.getenv("AIRFLOW_TRIGGER_COOLDOWN", "60"))
+
+DAG_TRIGGERS = Counter("rps_airflow_dag_triggers_total", "Retrain DAG trigger attempts by outcome.", ["outcome"])
+DAG_TRIGGER_SECONDS = Histogram("rps_airflow_dag_trigger_seconds", "Time spent talking to the Airflow API per trigger.")
+
+
+class AirflowTriggerClient:
+    """Triggers the retrain DAG without piling up runs.
+
+    Requests go through one pooled ``requests.Session`` with connect/read
+    timeouts and retries with exponential backoff. A trigger is coalesced
+    (skipped) while another trigger is in flight, within
+    ``cooldown`` seconds of the last successful one, or while the DAG
+    already has a queued or running run. ``submit`` runs the trigger on a
+    single background thread and returns immediately.
+    """
+
+    def __init__(self, api_url=AIRFLOW_API_URL, dag_id=RETRAIN_DAG_ID, auth=(AIRFLOW_USER, AIRFLOW_PASSWORD),
+                 cooldown=AIRFLOW_TRIGGER_COOLDOWN):
+        self.dag_runs_url = f"{api_url.rstrip('/')}/dags/{dag_id}/dagRuns"
+        self.auth = auth
+        self.cooldown = cooldown
+        self.timeout = (AIRFLOW_CONNECT_TIMEOUT, AIRFLOW_READ_TIMEOUT)
+        self._session = None
+        self._lock = threading.Lock()
+        self._in_flight = False
+        self._last_triggered = float("-inf")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rps-airflow-trigger")
+
+    def _get_session(self):
+        if self._session is None:
+            # Imported lazily: only needed when a retrain is due, not at backend startup.
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=AIRFLOW_RETRIES,
+                backoff_factor=AIRFLOW_BACKOFF,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "POST"})
+            )
+            session = requests.Session()
+            session.auth = self.auth
+            session.mount("http://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=2))
+            session.mount("https://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=2))
+            self._session = session
+        return self._session
 
-    user_pass = "admin:admin"
-    b64_encoded = base64.b64encode(user_pass.encode("utf-8")).decode("utf-8")
+    def active_runs(self):
+        """Returns how many runs of the DAG are queued or running."""
+        res = self._get_session().get(
+            self.dag_runs_url,
+            params=[("state", "queued"), ("state", "running"), ("limit", 1)],
+            timeout=self.timeout
+        )
+        res.raise_for_status()
+        return res.json().get("total_entries", 0)
 
-    headers = {
-        "Authorization": f"Basic {b64_encoded}",
-        "Content-Type": "application/json"
-    }
+    def trigger(self):
+        """Triggers the DAG unless the trigger is coalesced; returns True if a run was created."""
+        with self._lock:
+            if self._in_flight or time.monotonic() - self._last_triggered < self.cooldown:
+                DAG_TRIGGERS.labels(outcome="coalesced").inc()
+                return False
+            self._in_flight = True
 
-    payload = {
-        "dag_run_id": f"run_{datetime.datetime.utcnow().isoformat()}",
-        "conf": {}
-    }
+        try:
+            with DAG_TRIGGER_SECONDS.time():
+                if self.active_runs() > 0:
+                    logging.info("[AIRFLOW] Retrain DAG already queued or running; trigger coalesced.")
+                    DAG_TRIGGERS.labels(outcome="coalesced").inc()
+                    return False
 
-    res = requests.post(url, headers=headers, json=payload)
+                # A fixed run id makes retried POSTs idempotent: a duplicate comes back as 409.
+                payload = {
+                    "dag_run_id": f"run_{datetime.datetime.utcnow().isoformat()}",
+                    "conf": {}
+                }
+                res = self._get_session().post(self.dag_runs_url, json=payload, timeout=self.timeout)
+                if res.status_code not in (200, 409):
+                    raise Exception(f"Airflow DAG trigger failed: {res.text}")
 
-    if res.status_code != 200:
-        raise Exception(f"Airflow DAG trigger failed: {res.text}")
+            self._last_triggered = time.monotonic()
+            DAG_TRIGGERS.labels(outcome="triggered").inc()
+            logging.info(f"[AIRFLOW] Retrain DAG triggered ({payload['dag_run_id']}).")
+            return True
+        except Exception:
+            DAG_TRIGGERS.labels(outcome="failed").inc()
+            raise
+        finally:
+            with self._lock:
+                self._in_flight = False
+
+    def _trigger_logged(self):
+        try:
+            return self.trigger()
+        except Exception as e:
+            logging.error(f"[AIRFLOW ERROR] {e}")
+            return False
+
+    def submit(self):
+        """Schedules a trigger on the background thread; returns its future."""
+        return self._executor.submit(self._trigger_logged)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+
+airflow_client = AirflowTriggerClient()
+
+
+def trigger_airflow_dag():
+    return airflow_client.trigger()
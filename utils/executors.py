@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(os.cpu_count() or 4)))
+INFERENCE_QUEUE_LIMIT = int(os.getenv("INFERENCE_QUEUE_LIMIT", "64"))
+PERSIST_THREADS = int(os.getenv("PERSIST_THREADS", "4"))
+PERSIST_QUEUE_LIMIT = int(os.getenv("PERSIST_QUEUE_LIMIT", "128"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+
+class QueueFullError(Exception):
+    """Raised when a bounded queue rejects work instead of growing without limit."""
+
+
+class BoundedExecutor:
+    """Thread pool that refuses new work once ``max_workers + max_pending`` tasks are outstanding."""
+
+    def __init__(self, name, max_workers, max_pending):
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"rps-{name}")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"{self.name} queue is full")
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs ``fn`` on the pool and awaits it without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+        logging.info(f"[EXEC] Executor '{self.name}' shut down.")
+
+
+inference_executor = BoundedExecutor("inference", INFERENCE_THREADS, INFERENCE_QUEUE_LIMIT)
+persist_executor = BoundedExecutor("persist", PERSIST_THREADS, PERSIST_QUEUE_LIMIT)
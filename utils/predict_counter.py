@@ -1,21 +1,13 @@
-import json
 import os
-COUNTER_PATH = "utils/prediction_counter.json"
-THRESHOLD = 3 
-def increment_and_check():
-    if not os.path.exists(COUNTER_PATH):
-        with open(COUNTER_PATH, "w") as f:
-            json.dump({"count": 1}, f)
-        return False
-    with open(COUNTER_PATH, "r") as f:
-        data = json.load(f)
-    data["count"] += 1
-    if data["count"] >= THRESHOLD:
-        data["count"] = 0  
-        triggered = True
-    else:
-        triggered = False
-    with open(COUNTER_PATH, "w") as f:
-        json.dump(data, f)
+from psycopg2 import errors
+from Database_connection.db_init import DB_NAME, create_counter_table, increment_counter
 
-    return triggered
+THRESHOLD = int(os.getenv("RETRAIN_THRESHOLD", "3"))
+
+def increment_and_check(count=1, threshold=THRESHOLD, db_name=DB_NAME):
+    """Counts ``count`` new predictions; returns True when a retrain should be triggered."""
+    try:
+        return increment_counter(db_name, count, threshold)
+    except (errors.UndefinedTable, RuntimeError):
+        create_counter_table(db_name)
+        return increment_counter(db_name, count, threshold)
@@ -0,0 +1,47 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Gauge
+
+STARTUP_PHASE_SECONDS = Gauge("rps_startup_phase_seconds", "Time spent in each backend startup phase.", ["phase"])
+READY = Gauge("rps_ready", "1 once the backend has a warm model and accepts predictions.")
+
+
+class StartupTracker:
+    """Times startup phases and holds the readiness state behind /readyz."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = {}
+        self.error = None
+        self._ready = threading.Event()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        self.phases[name] = round(seconds, 3)
+        STARTUP_PHASE_SECONDS.labels(phase=name).set(seconds)
+        logging.info(f"[STARTUP] {name} took {seconds:.2f}s.")
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def mark_ready(self):
+        self.record("total", time.perf_counter() - self.started_at)
+        self.error = None
+        self._ready.set()
+        READY.set(1)
+
+    def mark_failed(self, error):
+        self.error = str(error)
+        READY.set(0)
+        logging.error(f"[STARTUP ERROR] Backend failed to become ready: {error}")